@@ -0,0 +1,225 @@
+"""
+Allocation engine benchmark.
+
+Generates reproducible synthetic queues and bed inventories at increasing
+scales, runs every solver backend (plus the decomposed mode) on each and
+records model build time, solve time, peak memory and objective value.
+Results are compared against a stored baseline so allocator regressions
+show up before they reach production.
+
+    python -m backend.benchmarks.allocation                      # compare with baseline
+    python -m backend.benchmarks.allocation --scales xs,s,m
+    python -m backend.benchmarks.allocation --mix Red=0.5,Yellow=0.3,Green=0.2
+    python -m backend.benchmarks.allocation --update-baseline
+
+Peak memory is the Python/NumPy heap seen by tracemalloc; the CBC backend
+runs its solver in a subprocess, which is not included.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from ..engine.milp_allocator import build_bed_classes, expand_class_assignments
+from ..engine.solvers import BACKENDS
+from ..engine.decomposition import solve_decomposed
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "allocation.json")
+
+# name -> (queued patients, available beds)
+SCALES = {
+    "xs": (10, 50),
+    "s": (100, 500),
+    "m": (300, 2_000),
+    "l": (1_000, 5_000),
+    "xl": (2_000, 10_000),
+    "xxl": (5_000, 20_000),
+}
+DEFAULT_MIX = {"Red": 0.2, "Yellow": 0.45, "Green": 0.35}
+BED_TYPE_MIX = {"ICU": 0.15, "Step-Down": 0.2, "General": 0.65}
+BEDS_PER_WARD = 40
+
+# CBC model build time grows with patient x class variables; past this it is skipped
+MAX_CBC_VARIABLES = 100_000
+
+# A run regresses when it is this much slower than baseline and above the noise floor
+TIME_TOLERANCE = 0.5
+TIME_NOISE_FLOOR_S = 0.05
+MEMORY_TOLERANCE = 0.5
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        level, weight = part.split("=")
+        mix[level.strip()] = float(weight)
+    total = sum(mix.values())
+    return {k: v / total for k, v in mix.items()}
+
+
+def generate_scenario(n_patients: int, n_beds: int, mix: dict = None, seed: int = 42):
+    """Deterministic synthetic queue and bed inventory for a given size and triage mix."""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+
+    levels, weights = zip(*mix.items())
+    acuity_range = {"Red": (75, 100), "Yellow": (40, 80), "Green": (5, 45)}
+    patients = []
+    for i in range(n_patients):
+        level = rng.choices(levels, weights)[0]
+        lo, hi = acuity_range.get(level, (1, 100))
+        patients.append({
+            "id": f"P-{i:06d}",
+            "triage_level": level,
+            "acuity_score": rng.randint(lo, hi),
+            "wait_time_mins": rng.randint(0, 240),
+        })
+
+    bed_types, type_weights = zip(*BED_TYPE_MIX.items())
+    n_wards = max(1, n_beds // BEDS_PER_WARD)
+    ward_types = [rng.choices(bed_types, type_weights)[0] for _ in range(n_wards)]
+    beds = []
+    for i in range(n_beds):
+        w = i % n_wards
+        beds.append({"id": f"B-{i:06d}", "ward_id": f"W-{w:04d}", "bed_type": ward_types[w]})
+    return patients, beds
+
+
+def _run_backend(name: str, patients: list, beds: list):
+    t0 = time.perf_counter()
+    bed_classes = build_bed_classes(beds)
+    if name == "decomposed":
+        result = solve_decomposed(patients, beds, engine="auto")
+        total = time.perf_counter() - t0
+        return {"build_s": 0.0, "solve_s": total, "objective": result["objective_value"],
+                "assigned": len(result["assignments"])}
+
+    backend = BACKENDS[name]
+    model = backend.build(patients, bed_classes)
+    t1 = time.perf_counter()
+    class_assignments, objective, _ = backend.run(model)
+    assignments = expand_class_assignments(class_assignments, bed_classes)
+    t2 = time.perf_counter()
+    return {"build_s": t1 - t0, "solve_s": t2 - t1, "objective": objective, "assigned": len(assignments)}
+
+
+def _skip_reason(name: str, patients: list, beds: list):
+    if name == "decomposed":
+        return None
+    backend = BACKENDS[name]
+    bed_classes = build_bed_classes(beds)
+    if not backend.available():
+        return "not installed"
+    if name == "cbc" and len(patients) * len(bed_classes) > MAX_CBC_VARIABLES:
+        return "model too large"
+    if not backend.supports(patients, bed_classes):
+        return "unsupported size"
+    return None
+
+
+def run_case(name: str, patients: list, beds: list, measure_memory: bool = True):
+    reason = _skip_reason(name, patients, beds)
+    if reason:
+        return {"skipped": reason}
+
+    record = _run_backend(name, patients, beds)
+    if measure_memory:
+        # Separate pass: tracemalloc slows Python-heavy model building down
+        tracemalloc.start()
+        _run_backend(name, patients, beds)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        record["peak_mem_mb"] = peak / 2**20
+
+    for key in ("build_s", "solve_s", "objective", "peak_mem_mb"):
+        if key in record:
+            record[key] = round(record[key], 4)
+    return record
+
+
+def compare(results: dict, baseline: dict):
+    """Returns a list of human readable regressions against the baseline."""
+    problems = []
+    for key, rec in results.items():
+        base = baseline.get(key)
+        if not base or "skipped" in rec or "skipped" in base:
+            continue
+        if abs(rec["objective"] - base["objective"]) > 1e-6:
+            problems.append(f"{key}: objective {rec['objective']} != baseline {base['objective']}")
+        for metric in ("build_s", "solve_s"):
+            now, then = rec[metric], base[metric]
+            if now > then * (1 + TIME_TOLERANCE) and now - then > TIME_NOISE_FLOOR_S:
+                problems.append(f"{key}: {metric} {now:.3f}s vs baseline {then:.3f}s")
+        if "peak_mem_mb" in rec and "peak_mem_mb" in base:
+            now, then = rec["peak_mem_mb"], base["peak_mem_mb"]
+            if now > then * (1 + MEMORY_TOLERANCE) and now - then > 1:
+                problems.append(f"{key}: peak_mem_mb {now:.1f} vs baseline {then:.1f}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bed allocation engines")
+    parser.add_argument("--scales", default=",".join(SCALES), help=f"comma separated subset of {list(SCALES)}")
+    parser.add_argument("--backends", default=",".join(list(BACKENDS) + ["decomposed"]))
+    parser.add_argument("--mix", default=None, help="triage mix, e.g. Red=0.2,Yellow=0.45,Green=0.35")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="also write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    mix_tag = ",".join(f"{k}={v:.2f}" for k, v in mix.items())
+
+    results = {}
+    for scale in args.scales.split(","):
+        n_patients, n_beds = SCALES[scale]
+        patients, beds = generate_scenario(n_patients, n_beds, mix, args.seed)
+        for name in args.backends.split(","):
+            key = f"{scale}:{n_patients}x{n_beds}:{name}"
+            if args.mix:
+                key += f":{mix_tag}"
+            rec = run_case(name, patients, beds, measure_memory=not args.no_memory)
+            results[key] = rec
+            if "skipped" in rec:
+                print(f"{key:<40} skipped ({rec['skipped']})")
+            else:
+                mem = f"{rec['peak_mem_mb']:8.1f}MB" if "peak_mem_mb" in rec else ""
+                print(f"{key:<40} build {rec['build_s']:8.3f}s  solve {rec['solve_s']:8.3f}s  "
+                      f"{mem}  objective {rec['objective']:.1f} ({rec['assigned']} assigned)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    problems = compare(results, baseline)
+    for p in problems:
+        print("REGRESSION", p)
+    if not problems:
+        print("No regressions against baseline.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
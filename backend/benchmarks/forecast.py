@@ -0,0 +1,55 @@
+"""
+Forecaster backtest.
+
+Rolling-origin cross-validation of the candidate forecasting models on the
+admission history (the same series /api/forecast uses), reporting
+out-of-sample error and fit / predict latency per model.
+
+    python -m backend.benchmarks.forecast
+    python -m backend.benchmarks.forecast --horizon 14 --folds 20 --max-mae 12
+    python -m backend.benchmarks.forecast --models arima_7_1_0,seasonal_naive
+"""
+import argparse
+import json
+import sys
+
+from ..database import Base, engine
+from ..engine.backtest import CANDIDATES, backtest
+from ..engine.forecaster import get_forecaster
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the admission forecasting models")
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--folds", type=int, default=8)
+    parser.add_argument("--step", type=int, default=1, help="days between forecast origins")
+    parser.add_argument("--models", default=",".join(CANDIDATES))
+    parser.add_argument("--max-mae", type=float, default=None, help="accuracy bar for the recommendation")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="also write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    # On a new database the forecaster falls back to synthetic history
+    Base.metadata.create_all(bind=engine)
+    forecaster = get_forecaster()
+    report = backtest(forecaster.history_values, horizon=args.horizon, folds=args.folds, step=args.step,
+                      models=args.models.split(","), max_workers=args.workers, max_mae=args.max_mae)
+
+    print(f"{report['history_days']} days of {forecaster.source} history, "
+          f"{report['origins']} origins, horizon {report['horizon']}")
+    for name, rec in report["models"].items():
+        if not rec["folds"]:
+            print(f"{name:<16} failed: {rec['error']}")
+            continue
+        print(f"{name:<16} MAE {rec['mae']:7.2f}  RMSE {rec['rmse']:7.2f}  MASE {rec['mase']:6.3f}  "
+              f"fit {rec['fit_ms']:8.2f}ms  predict {rec['predict_ms']:7.3f}ms")
+    print(f"Recommended: {report['recommended']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
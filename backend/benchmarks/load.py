@@ -0,0 +1,371 @@
+"""
+HTTP / WebSocket load benchmark.
+
+Drives the FastAPI app from backend/main.py in-process: a synthetic
+hospital (backend/synthetic.py) is generated into a temporary SQLite
+database, then concurrent virtual users run a weighted mix of the main
+endpoints for a fixed time while WebSocket subscribers listen on
+/ws/dashboard and /ws/events. Reports throughput and p50/p95/p99 latency
+per endpoint, plus how late bus events reach subscribers. Results are
+compared against a stored baseline, like the other benchmarks.
+
+    python -m backend.benchmarks.load                       # compare with baseline
+    python -m backend.benchmarks.load --users 32 --duration 20 --scale m
+    python -m backend.benchmarks.load --update-baseline
+
+Each virtual user is an asyncio task talking to the app through
+httpx.ASGITransport, so the numbers cover routing, validation, the
+handlers and the database, but not the network or the ASGI server.
+Every user draws its requests from its own seeded RNG, so the request mix
+is the same from run to run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load.json")
+
+# name -> (wards, beds, historical admissions, queued patients)
+SCALES = {
+    "s": (20, 2_000, 50_000, 300),
+    "m": (60, 10_000, 200_000, 1_000),
+    "l": (150, 40_000, 500_000, 3_000),
+}
+
+# Relative weight of each operation in a virtual user's mix
+MIX = {
+    "queue": 20,
+    "beds": 12,
+    "beds_ward": 8,
+    "wards": 10,
+    "kpis": 15,
+    "forecast": 5,
+    "intake": 4,
+    "assign": 4,
+    "optimize": 1,
+}
+QUEUE_PAGE = 50
+BEDS_PAGE = 200
+
+# A run regresses when p95 is this much slower than baseline and above the
+# noise floor, or throughput drops by more than THROUGHPUT_TOLERANCE
+LATENCY_TOLERANCE = 0.5
+LATENCY_NOISE_FLOOR_MS = 5
+THROUGHPUT_TOLERANCE = 0.3
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2)}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, ok: bool):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        return {
+            name: {"requests": len(samples), "errors": self.errors.get(name, 0),
+                   "rps": round(len(samples) / elapsed, 1), **percentiles(samples)}
+            for name, samples in sorted(self.latencies.items())
+        }
+
+
+class Workload:
+    """
+    Shared state for the virtual users: the ward list, plus the free beds
+    and waiting patients that assign draws from. An assign books a bed,
+    then discharges the patient and releases the bed again, so the
+    inventory stays level through the run. Those two follow-up calls are
+    recorded as "discharge" and "release".
+    """
+
+    def __init__(self, client, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+        self.wards = []
+        self.free_beds = []
+        self.waiting = []
+
+    async def prime(self):
+        self.wards = [w["id"] for w in (await self.client.get("/api/wards")).json()]
+        self.free_beds = [b["id"] for b in (await self.client.get("/api/beds", params={"status": "Available"})).json()]
+        self.waiting = [p["id"] for p in (await self.client.get("/api/patients/queue")).json()]
+
+    async def timed(self, name: str, method: str, url: str, ok_status=(200,), **kwargs):
+        t = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.record(name, time.perf_counter() - t, response.status_code in ok_status)
+        return response
+
+    async def run(self, name: str, rng: random.Random):
+        if name == "queue":
+            await self.timed(name, "GET", "/api/patients/queue", params={"limit": QUEUE_PAGE})
+        elif name == "beds":
+            await self.timed(name, "GET", "/api/beds", params={"limit": BEDS_PAGE})
+        elif name == "beds_ward":
+            await self.timed(name, "GET", "/api/beds", params={"ward_id": rng.choice(self.wards)})
+        elif name == "wards":
+            await self.timed(name, "GET", "/api/wards")
+        elif name == "kpis":
+            await self.timed(name, "GET", "/api/dashboard/kpis")
+        elif name == "forecast":
+            await self.timed(name, "GET", "/api/forecast", params={"days": 7})
+        elif name == "intake":
+            level, lo, hi = rng.choice([("Red", 80, 99), ("Yellow", 50, 79), ("Green", 10, 49)])
+            response = await self.timed(name, "POST", "/api/patients", json={
+                "name": "Load Test", "age": rng.randint(1, 95), "condition": "Synthetic",
+                "triage_level": level, "acuity_score": rng.randint(lo, hi)})
+            if response.status_code == 200:
+                self.waiting.append(response.json()["id"])
+        elif name == "assign":
+            if not self.waiting or not self.free_beds:
+                return
+            patient = self.waiting.pop(rng.randrange(len(self.waiting)))
+            bed = self.free_beds.pop(rng.randrange(len(self.free_beds)))
+            # A 409 is a lost compare-and-set race, which is a valid outcome
+            response = await self.timed(name, "POST", f"/api/patients/{patient}/assign",
+                                        ok_status=(200, 409), json={"bed_id": bed})
+            if response.status_code == 200:
+                await self.timed("discharge", "POST", f"/api/patients/{patient}/discharge")
+                await self.timed("release", "POST", f"/api/beds/{bed}/status", json={"status": "Available"})
+            self.free_beds.append(bed)
+        elif name == "optimize":
+            await self.timed(name, "POST", "/api/allocation/optimize", ok_status=(200, 400))
+
+
+async def virtual_user(workload: Workload, seed: int, deadline: float):
+    rng = random.Random(seed)
+    names, weights = zip(*MIX.items())
+    while time.perf_counter() < deadline:
+        await workload.run(rng.choices(names, weights)[0], rng)
+
+
+class Subscriber:
+    """
+    Minimal in-process WebSocket client speaking raw ASGI, so subscribers
+    share the users' event loop. For /ws/events it records the delay
+    between an event being published and it arriving here.
+    """
+
+    def __init__(self, app, path: str, query: str = "", client_id: int = 0):
+        self.app = app
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+            "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("127.0.0.1", 10000 + client_id),
+            "subprotocols": [],
+        }
+        self.inbox = asyncio.Queue()
+        self.messages = 0
+        self.lags = []
+        self.accepted = False
+        self.task = None
+
+    async def _receive(self):
+        return await self.inbox.get()
+
+    async def _send(self, message: dict):
+        if message["type"] == "websocket.accept":
+            self.accepted = True
+        elif message["type"] == "websocket.send":
+            self.messages += 1
+            data = json.loads(message.get("text") or message.get("bytes"))
+            now = time.time()
+            for event in data.get("events", []):
+                self.lags.append(now - event["ts"])
+
+    def start(self):
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(self.app(self.scope, self._receive, self._send))
+
+    async def stop(self):
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self.task, 5)
+        except (asyncio.TimeoutError, Exception):
+            self.task.cancel()
+
+
+async def run_load(app, users: int, duration: float, subscribers: int, seed: int) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            workload = Workload(client, recorder)
+            await workload.prime()
+
+            subs = [Subscriber(app, "/ws/dashboard", client_id=i) if i % 2 == 0 else
+                    Subscriber(app, "/ws/events", "topics=beds,queue", client_id=i)
+                    for i in range(subscribers)]
+            for s in subs:
+                s.start()
+
+            # Warm-up pass so one-off loads (bed index, triage queue, model) are not timed
+            warm = Workload(client, Recorder())
+            warm.wards, warm.waiting, warm.free_beds = workload.wards, [], []
+            for name in MIX:
+                await warm.run(name, random.Random(seed))
+
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(virtual_user(workload, seed + i, deadline) for i in range(users)))
+            elapsed = time.perf_counter() - started
+            await asyncio.sleep(0.3)  # let the last event batch reach the subscribers
+
+            for s in subs:
+                await s.stop()
+
+    endpoints = recorder.summary(elapsed)
+    total = sum(e["requests"] for e in endpoints.values())
+    dashboard = [s for s in subs if s.scope["path"] == "/ws/dashboard"]
+    events = [s for s in subs if s.scope["path"] == "/ws/events"]
+    return {
+        "endpoints": endpoints,
+        "total": {"requests": total, "errors": sum(e["errors"] for e in endpoints.values()),
+                  "rps": round(total / elapsed, 1),
+                  **percentiles([x for samples in recorder.latencies.values() for x in samples])},
+        "websocket": {
+            "dashboard_subscribers": len(dashboard),
+            "dashboard_messages": sum(s.messages for s in dashboard),
+            "events_subscribers": len(events),
+            "events_messages": sum(s.messages for s in events),
+            "event_lag": percentiles([x for s in events for x in s.lags]),
+            "not_accepted": sum(not s.accepted for s in subs),
+        },
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def setup(scale: str, seed: int):
+    """
+    Points the app at a fresh temporary database filled with a synthetic
+    hospital and returns it. Must run before anything imports
+    backend.database, which reads DATABASE_URL at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix="smartbed-load-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["FORECASTER_MODEL_DIR"] = os.path.join(workdir, "models")
+    os.environ["FORECASTER_WARMUP"] = "0"
+
+    from ..synthetic import generate_hospital
+    from ..engine.forecaster import get_forecaster
+
+    wards, beds, history, queue = SCALES[scale]
+    generate_hospital(wards, beds, history, queue, reset=True, seed=seed)
+    get_forecaster()  # fit once up front; the forecast endpoint is timed warm
+    from ..main import app
+    return app
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Returns a list of human readable regressions against the baseline.
+    Keys carry the scale and user count; a run with no matching baseline
+    entries is reported as a problem rather than passing silently.
+    """
+    problems = []
+    missing = [key for key in results if key not in baseline]
+    if len(missing) == len(results):
+        stored = sorted({key.rsplit(":", 1)[0] for key in baseline})
+        return [f"no baseline for {', '.join(sorted({key.rsplit(':', 1)[0] for key in results}))} "
+                f"(stored: {', '.join(stored) or 'none'}); rerun with the same --scale/--users "
+                f"or record one with --update-baseline"]
+    for key in missing:
+        problems.append(f"{key}: not in baseline")
+    for key, rec in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if rec["errors"] and not base["errors"]:
+            problems.append(f"{key}: {rec['errors']} errors, baseline had none")
+        now, then = rec["p95_ms"], base["p95_ms"]
+        if now is not None and then is not None and now > then * (1 + LATENCY_TOLERANCE) and now - then > LATENCY_NOISE_FLOOR_MS:
+            problems.append(f"{key}: p95 {now:.1f}ms vs baseline {then:.1f}ms")
+        if rec["rps"] < base["rps"] * (1 - THROUGHPUT_TOLERANCE):
+            problems.append(f"{key}: {rec['rps']} req/s vs baseline {base['rps']} req/s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the API and WebSockets in-process")
+    parser.add_argument("--scale", choices=SCALES, default="s")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of measured load")
+    parser.add_argument("--subscribers", type=int, default=8, help="WebSocket clients, split between /ws/dashboard and /ws/events")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="also write the full report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    print(f"Generating the '{args.scale}' hospital...")
+    app = setup(args.scale, args.seed)
+    print(f"Running {args.users} users and {args.subscribers} subscribers for {args.duration:.0f}s...")
+    report = asyncio.run(run_load(app, args.users, args.duration, args.subscribers, args.seed))
+
+    print(f"\n{'endpoint':<12} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, e in list(report["endpoints"].items()) + [("TOTAL", report["total"])]:
+        print(f"{name:<12} {e['requests']:>9} {e['errors']:>7} {e['rps']:>8.1f} "
+              f"{e['p50_ms'] or 0:>8.1f} {e['p95_ms'] or 0:>8.1f} {e['p99_ms'] or 0:>8.1f}")
+    ws = report["websocket"]
+    lag = ws["event_lag"]
+    print(f"\nwebsocket: {ws['dashboard_messages']} KPI messages to {ws['dashboard_subscribers']} dashboard clients, "
+          f"{ws['events_messages']} event batches to {ws['events_subscribers']} event clients, "
+          f"event lag p50/p95/p99 {lag['p50_ms']}/{lag['p95_ms']}/{lag['p99_ms']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    prefix = f"{args.scale}:{args.users}u"
+    results = {f"{prefix}:{name}": e for name, e in report["endpoints"].items()}
+    results[f"{prefix}:total"] = report["total"]
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    problems = compare(results, baseline)
+    if ws["not_accepted"]:
+        problems.append(f"{ws['not_accepted']} WebSocket subscribers were not accepted")
+    for p in problems:
+        print("REGRESSION", p)
+    if not problems:
+        print("No regressions against baseline.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
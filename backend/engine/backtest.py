@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+
+from .forecaster import ARIMA_ORDER, MIN_ARIMA_POINTS, seasonal_naive_forecast
+
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+
+# One pool per process, shared by every backtest that does not ask for its own
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BACKTEST_WORKERS)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ---- candidate models ----
+# Each takes the training values and a horizon and returns (point forecast,
+# predict seconds). Pool workers look them up by name, so only names are pickled.
+
+def _arima(order):
+    def fit_predict(train, horizon):
+        model = ARIMA(np.asarray(train, dtype=float), order=order).fit()
+        t = time.perf_counter()
+        mean = model.forecast(horizon)
+        return mean, time.perf_counter() - t
+    return fit_predict
+
+
+def _seasonal_naive(train, horizon):
+    t = time.perf_counter()
+    mean = seasonal_naive_forecast([train], horizon)[0][0]
+    return mean, time.perf_counter() - t
+
+
+def _naive(train, horizon):
+    t = time.perf_counter()
+    mean = np.repeat(float(train[-1]), horizon)
+    return mean, time.perf_counter() - t
+
+
+def _weekly_mean(train, horizon):
+    t = time.perf_counter()
+    mean = np.repeat(float(np.mean(train[-7:])), horizon)
+    return mean, time.perf_counter() - t
+
+
+CANDIDATES = {
+    "arima_{}_{}_{}".format(*ARIMA_ORDER): _arima(ARIMA_ORDER),
+    "arima_1_1_1": _arima((1, 1, 1)),
+    "seasonal_naive": _seasonal_naive,
+    "weekly_mean": _weekly_mean,
+    "naive": _naive,
+}
+
+
+def rolling_origins(n: int, horizon: int, folds: int, step: int = 1, min_train: int = MIN_ARIMA_POINTS):
+    """Training-set lengths for the last `folds` forecast origins, `step` days apart."""
+    last = n - horizon
+    origins = [last - i * step for i in range(folds)]
+    return sorted(o for o in origins if o >= min_train)
+
+
+def _run_fold(args):
+    name, values, origin, horizon = args
+    train = values[:origin]
+    actual = np.asarray(values[origin:origin + horizon], dtype=float)
+    t = time.perf_counter()
+    try:
+        mean, predict_s = CANDIDATES[name](train, horizon)
+    except Exception as e:
+        return {"model": name, "origin": origin, "error": str(e)}
+    fit_s = time.perf_counter() - t - predict_s
+    errors = np.asarray(mean, dtype=float)[:len(actual)] - actual
+    return {"model": name, "origin": origin, "errors": errors.tolist(), "fit_s": fit_s, "predict_s": predict_s}
+
+
+def backtest(values: list, horizon: int = 7, folds: int = 8, step: int = 1, models: list = None,
+             max_workers: int = None, max_mae: float = None):
+    """
+    Rolling-origin cross-validation: every candidate model is refit at each
+    origin on the history up to it and scored on the following `horizon`
+    days. (model, fold) pairs run in parallel on the shared process pool,
+    or on a dedicated one of `max_workers` when given. Returns
+    per-model out-of-sample MAE / RMSE / MASE and mean fit / predict latency,
+    plus the recommended model: the cheapest one with MAE <= max_mae, or the
+    most accurate when no bar is given.
+    """
+    models = models or list(CANDIDATES)
+    unknown = [m for m in models if m not in CANDIDATES]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {unknown}. Choose from: {', '.join(CANDIDATES)}")
+
+    values = list(values)
+    origins = rolling_origins(len(values), horizon, folds, step)
+    if not origins:
+        raise ValueError(f"Need at least {MIN_ARIMA_POINTS + horizon} days of history to backtest")
+
+    tasks = [(m, values, o, horizon) for m in models for o in origins]
+    if max_workers is None:
+        runs = list(_shared_pool().map(_run_fold, tasks)) if BACKTEST_WORKERS > 1 else [_run_fold(t) for t in tasks]
+    elif max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+            runs = list(pool.map(_run_fold, tasks))
+    else:
+        runs = [_run_fold(t) for t in tasks]
+
+    # Scale for MASE: in-sample one-step naive error on the first training window
+    y = np.asarray(values[:origins[0]], dtype=float)
+    scale = float(np.mean(np.abs(np.diff(y)))) or 1.0
+
+    results = {}
+    for m in models:
+        mine = [r for r in runs if r["model"] == m]
+        ok = [r for r in mine if "errors" in r]
+        if not ok:
+            results[m] = {"folds": 0, "failed": len(mine), "error": mine[0]["error"] if mine else None}
+            continue
+        errors = np.concatenate([r["errors"] for r in ok])
+        mae = float(np.mean(np.abs(errors)))
+        results[m] = {
+            "folds": len(ok),
+            "failed": len(mine) - len(ok),
+            "mae": round(mae, 2),
+            "rmse": round(float(np.sqrt(np.mean(errors ** 2))), 2),
+            "mase": round(mae / scale, 3),
+            "fit_ms": round(1000 * float(np.mean([r["fit_s"] for r in ok])), 2),
+            "predict_ms": round(1000 * float(np.mean([r["predict_s"] for r in ok])), 3),
+        }
+
+    scored = {m: r for m, r in results.items() if r["folds"]}
+    if max_mae is not None:
+        passing = [m for m, r in scored.items() if r["mae"] <= max_mae]
+        recommended = min(passing, key=lambda m: scored[m]["fit_ms"] + scored[m]["predict_ms"]) if passing else None
+    else:
+        recommended = min(scored, key=lambda m: scored[m]["mae"]) if scored else None
+
+    return {
+        "horizon": horizon,
+        "origins": len(origins),
+        "history_days": len(values),
+        "max_mae": max_mae,
+        "recommended": recommended,
+        "models": results,
+    }
@@ -0,0 +1,221 @@
+import threading
+import time
+
+import numpy as np
+
+STATUSES = ("Available", "Occupied", "Cleaning", "Maintenance")
+
+
+class BedIndex:
+    """
+    In-process index of every bed's ward, type and status, kept as compact
+    NumPy code columns plus a (ward, bed_type, status) count cube. Counts
+    are O(1) lookups on the cube and filtered bed lists are one vectorized
+    scan, so the beds / wards / KPI / allocation read paths do not have to
+    hit the database. Write paths call set_status / add_bed after their
+    commit to keep it coherent.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        # Bumped on every write; readers use it for ETags
+        self.version = 0
+        self.modified_at = time.time()
+        self._order = None       # rows sorted by bed id, rebuilt after add_bed
+        self.size = 0
+        self.ids = []
+        self.rows = {}           # bed_id -> row
+        self.patients = []       # row -> patient_id or None
+        self.wards = []          # ward code -> {"id", "name", "capacity", "staff_ratio"}
+        self.ward_codes = {}
+        self.types = []
+        self.type_codes = {}
+        self.statuses = list(STATUSES)
+        self.status_codes = {s: i for i, s in enumerate(STATUSES)}
+        self.ward_col = np.zeros(64, dtype=np.int32)
+        self.type_col = np.zeros(64, dtype=np.int16)
+        self.status_col = np.zeros(64, dtype=np.int8)
+        self.counts = np.zeros((0, 0, len(STATUSES)), dtype=np.int64)
+
+    # ---- codes ----
+
+    def _grow_counts(self):
+        w, t, s = self.counts.shape
+        pad = ((0, len(self.wards) - w), (0, len(self.types) - t), (0, len(self.statuses) - s))
+        if any(p[1] for p in pad):
+            self.counts = np.pad(self.counts, pad)
+
+    def _ward_code(self, ward_id):
+        code = self.ward_codes.get(ward_id)
+        if code is None:
+            code = self.ward_codes[ward_id] = len(self.wards)
+            self.wards.append({"id": ward_id, "name": None, "capacity": None, "staff_ratio": None})
+            self._grow_counts()
+        return code
+
+    def _touch(self):
+        self.version += 1
+        self.modified_at = time.time()
+
+    def _code(self, table, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+            self._grow_counts()
+        return code
+
+    # ---- loading / writes ----
+
+    def load(self, wards: list, beds: list):
+        """wards: dicts with id, name, capacity, staff_ratio; beds: dicts with id, ward_id, bed_type, status, patient_id."""
+        with self.lock:
+            self._reset()
+            for w in wards:
+                self.upsert_ward(w)
+            for b in beds:
+                self.add_bed(b)
+            self.loaded = True
+
+    def upsert_ward(self, ward: dict):
+        with self.lock:
+            self.wards[self._ward_code(ward["id"])].update(ward)
+            self._touch()
+
+    def add_bed(self, bed: dict):
+        with self.lock:
+            if bed["id"] in self.rows:
+                self.set_status(bed["id"], bed["status"], bed.get("patient_id"))
+                return
+            if self.size == len(self.ward_col):
+                self.ward_col = np.resize(self.ward_col, 2 * self.size)
+                self.type_col = np.resize(self.type_col, 2 * self.size)
+                self.status_col = np.resize(self.status_col, 2 * self.size)
+            row = self.size
+            w = self._ward_code(bed["ward_id"])
+            t = self._code(self.types, self.type_codes, bed["bed_type"])
+            s = self._code(self.statuses, self.status_codes, bed["status"])
+            self.ward_col[row], self.type_col[row], self.status_col[row] = w, t, s
+            self.counts[w, t, s] += 1
+            self.ids.append(bed["id"])
+            self.patients.append(bed.get("patient_id"))
+            self.rows[bed["id"]] = row
+            self.size += 1
+            self._order = None
+            self._touch()
+
+    def set_status(self, bed_id: str, status: str, patient_id: str = None):
+        """Returns the previous status, or None if the bed is not indexed."""
+        with self.lock:
+            row = self.rows.get(bed_id)
+            if row is None:
+                return None
+            old = int(self.status_col[row])
+            new = self._code(self.statuses, self.status_codes, status)
+            w, t = self.ward_col[row], self.type_col[row]
+            self.counts[w, t, old] -= 1
+            self.counts[w, t, new] += 1
+            self.status_col[row] = new
+            self.patients[row] = patient_id
+            self._touch()
+            return self.statuses[old]
+
+    # ---- reads ----
+
+    def _mask(self, ward_id=None, bed_type=None, status=None):
+        n = self.size
+        mask = np.ones(n, dtype=bool)
+        for value, codes, column in ((ward_id, self.ward_codes, self.ward_col), (bed_type, self.type_codes, self.type_col),
+                                     (status, self.status_codes, self.status_col)):
+            if value is not None:
+                code = codes.get(value)
+                if code is None:
+                    return np.zeros(n, dtype=bool)
+                mask &= column[:n] == code
+        return mask
+
+    def select(self, ward_id=None, bed_type=None, status=None) -> list:
+        """Bed ids matching every given filter, in load order."""
+        with self.lock:
+            return [self.ids[i] for i in np.flatnonzero(self._mask(ward_id, bed_type, status))]
+
+    def count(self, ward_id=None, bed_type=None, status=None) -> int:
+        with self.lock:
+            index = []
+            for value, codes in ((ward_id, self.ward_codes), (bed_type, self.type_codes), (status, self.status_codes)):
+                if value is None:
+                    index.append(slice(None))
+                elif value in codes:
+                    index.append(codes[value])
+                else:
+                    return 0
+            return int(self.counts[tuple(index)].sum())
+
+    def counts_by(self, *dims) -> dict:
+        """Counts grouped by any of "ward", "bed_type", "status", e.g. counts_by("ward", "status") -> {(ward_id, status): n}."""
+        axes = {"ward": 0, "bed_type": 1, "status": 2}
+        with self.lock:
+            labels = ([w["id"] for w in self.wards], self.types, self.statuses)
+            keep = sorted(axes[d] for d in dims)
+            cube = self.counts.sum(axis=tuple(a for a in range(3) if a not in keep))
+            order = [keep.index(axes[d]) for d in dims]
+            result = {}
+            for codes in zip(*np.nonzero(cube)):
+                named = [labels[a][c] for a, c in zip(keep, codes)]
+                key = tuple(named[i] for i in order)
+                result[key if len(key) > 1 else key[0]] = int(cube[codes])
+            return result
+
+    def get(self, bed_id: str):
+        with self.lock:
+            row = self.rows.get(bed_id)
+            return None if row is None else self._bed(row)
+
+    def _bed(self, row: int) -> dict:
+        return {
+            "id": self.ids[row],
+            "ward_id": self.wards[self.ward_col[row]]["id"],
+            "bed_type": self.types[self.type_col[row]],
+            "status": self.statuses[self.status_col[row]],
+            "patient_id": self.patients[row],
+        }
+
+    def beds(self, ward_id=None, bed_type=None, status=None) -> list:
+        with self.lock:
+            return [self._bed(i) for i in np.flatnonzero(self._mask(ward_id, bed_type, status))]
+
+    def page(self, ward_id=None, bed_type=None, status=None, after: str = None, limit: int = None):
+        """
+        Keyset page in bed id order: matching beds with id > `after`, at most
+        `limit` of them. Returns (beds, next_after); next_after is None on the
+        last page.
+        """
+        with self.lock:
+            if self._order is None:
+                ids = np.asarray(self.ids, dtype=object)
+                self._order = np.argsort(ids, kind="stable")
+                self._sorted_ids = ids[self._order]
+            start = int(np.searchsorted(self._sorted_ids, after, side="right")) if after is not None else 0
+            rows = self._order[start:]
+            rows = rows[self._mask(ward_id, bed_type, status)[rows]]
+            more = limit is not None and len(rows) > limit
+            if limit is not None:
+                rows = rows[:limit]
+            beds = [self._bed(i) for i in rows]
+            return beds, (beds[-1]["id"] if more else None)
+
+    def ward(self, ward_id: str):
+        with self.lock:
+            code = self.ward_codes.get(ward_id)
+            return None if code is None else dict(self.wards[code])
+
+    def ward_list(self) -> list:
+        with self.lock:
+            return [dict(w) for w in self.wards]
+
+
+bed_index = BedIndex()
@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .milp_allocator import build_bed_classes, is_compatible
+from .solvers import solve_allocation
+from .incremental import AllocationState, MAX_CYCLE_TYPES
+
+DECOMPOSE_WORKERS = int(os.getenv("DECOMPOSE_WORKERS", os.cpu_count() or 1))
+# Large components are split by ward into parts of about this many patients
+PARTITION_PATIENTS = 500
+
+
+def connected_components(patients: list, beds: list):
+    """
+    Splits the compatibility graph (patients <-> (ward_id, bed_type) classes)
+    into independent components. Returns a list of (patients, beds) pairs;
+    patients and beds with no compatible counterpart are dropped.
+    """
+    bed_classes = build_bed_classes(beds)
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[ra] = rb
+
+    # Compatibility only depends on (triage_level, bed_type) for class edges,
+    # but the positive-score filter also depends on the patient, so check each.
+    for p in patients:
+        for ci, c in enumerate(bed_classes):
+            if is_compatible(p, c['bed_type']):
+                union(("p", p['id']), ("c", ci))
+
+    groups = {}
+    for p in patients:
+        node = ("p", p['id'])
+        if node in parent:
+            groups.setdefault(find(node), ([], []))[0].append(p)
+    for ci, c in enumerate(bed_classes):
+        node = ("c", ci)
+        if node in parent:
+            beds_in_class = [{"id": bid, "ward_id": c['ward_id'], "bed_type": c['bed_type']} for bid in c['bed_ids']]
+            groups.setdefault(find(node), ([], []))[1].extend(beds_in_class)
+    return list(groups.values())
+
+
+def partition_by_ward(patients: list, beds: list, parts: int):
+    """
+    Splits one component into `parts` ward groups that each get a similar
+    share of every bed type, and deals patients out round-robin so every
+    part sees a similar triage mix. The parts are only approximately
+    independent; the coordination pass makes the merged result exact.
+    """
+    if parts <= 1:
+        return [(patients, beds)]
+
+    wards_by_type = {}
+    for b in beds:
+        wards_by_type.setdefault(b['bed_type'], {}).setdefault(b['ward_id'], []).append(b)
+
+    part_beds = [[] for _ in range(parts)]
+    for ward_beds in wards_by_type.values():
+        load = [0] * parts
+        # Largest ward first into the lightest part
+        for ward in sorted(ward_beds.values(), key=len, reverse=True):
+            i = load.index(min(load))
+            part_beds[i].extend(ward)
+            load[i] += len(ward)
+
+    ordered = sorted(patients, key=lambda p: (p['triage_level'], -p['acuity_score'], p['id']))
+    part_patients = [ordered[i::parts] for i in range(parts)]
+    return [(pp, pb) for pp, pb in zip(part_patients, part_beds) if pp and pb]
+
+
+def _solve_part(args):
+    patients, beds, engine, time_limit = args
+    return solve_allocation(patients, beds, engine=engine, time_limit=time_limit)
+
+
+def solve_decomposed(patients: list, beds: list, engine: str = "auto", time_limit: float = None,
+                     max_workers: int = None):
+    """
+    Decomposed allocation: independent components of the compatibility graph
+    (and ward partitions of large components) are solved in parallel, merged,
+    and a coordination pass repairs the merged assignment on the incremental
+    state so shared capacity (e.g. Step-Down, used by both Red and Yellow)
+    ends up optimally split. Returns the same dict as solve_allocation plus
+    "components" and "parts".
+    """
+    if not patients or not beds:
+        return {"assignments": {}, "objective_value": 0.0, "engine": None, "optimal": True, "gap": 0.0,
+                "components": 0, "parts": 0}
+
+    max_workers = max_workers or DECOMPOSE_WORKERS
+    components = connected_components(patients, beds)
+
+    subproblems = []
+    for comp_patients, comp_beds in components:
+        parts = max(1, round(len(comp_patients) / PARTITION_PATIENTS))
+        for part_patients, part_beds in partition_by_ward(comp_patients, comp_beds, parts):
+            subproblems.append((part_patients, part_beds, engine, time_limit))
+
+    if len(subproblems) > 1 and max_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(subproblems))) as pool:
+            results = list(pool.map(_solve_part, subproblems))
+    else:
+        results = [_solve_part(sp) for sp in subproblems]
+
+    merged = {}
+    for r in results:
+        merged.update(r["assignments"])
+
+    # Coordination pass: moves patients across part boundaries until no
+    # improving path or cycle is left, which also settles how shared bed types
+    # are split. It certifies optimality when all cycles were searched.
+    state = AllocationState()
+    state.load(patients, beds, merged)
+    state.polish()
+    optimal = len(state.free) <= MAX_CYCLE_TYPES
+
+    engines = sorted({r["engine"] for r in results if r["engine"]})
+    return {
+        "assignments": state.assignments(),
+        "objective_value": state.objective,
+        "engine": "+".join(engines) if engines else None,
+        "optimal": optimal,
+        "gap": 0.0 if optimal else max((r["gap"] for r in results), default=0.0),
+        "components": len(components),
+        "parts": len(subproblems),
+    }
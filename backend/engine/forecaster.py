@@ -1,89 +1,429 @@
 import pandas as pd
 import numpy as np
 import datetime
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 from statsmodels.tsa.arima.model import ARIMA
 
+from ..database import SessionLocal
+from ..models import Patient
+
+# Bump when the training code changes so stored models are refit
+MODEL_VERSION = 1
+ARIMA_ORDER = (7, 1, 0)
+MODEL_DIR = os.getenv("FORECASTER_MODEL_DIR", os.path.join(os.path.dirname(__file__), "model_store"))
+# Stored model files kept after a save: the current one plus the previous ones
+MODELS_KEPT = int(os.getenv("FORECASTER_MODELS_KEPT", "2"))
+# Series shorter than this use the vectorized seasonal-naive fallback instead of ARIMA
+MIN_ARIMA_POINTS = 21
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", os.cpu_count() or 1))
+# New days are appended to the fitted ARIMA state; a full refit happens once
+# this many days have been appended since the last one (0 = never)
+REFIT_AFTER_DAYS = int(os.getenv("FORECASTER_REFIT_DAYS", "0"))
+
+
+def daily_admissions(db: Session, since: datetime.date = None, until: datetime.date = None):
+    """
+    Admissions per day from Patient.admission_time, counted in SQL so only
+    one row per day leaves the database. Covers [since, until) with missing
+    days filled with 0; `since` defaults to the first admission and `until`
+    to today (today is still incomplete). Returns (dates, values).
+    """
+    until = until or datetime.date.today()
+    day = func.date(Patient.admission_time)
+    query = db.query(day, func.count(Patient.id)).filter(
+        Patient.admission_time.isnot(None),
+        Patient.admission_time < datetime.datetime.combine(until, datetime.time.min),
+    )
+    if since is not None:
+        query = query.filter(Patient.admission_time >= datetime.datetime.combine(since, datetime.time.min))
+    counts = {datetime.date.fromisoformat(str(d)[:10]): c for d, c in query.group_by(day).all()}
+
+    if since is None:
+        if not counts:
+            return [], []
+        since = min(counts)
+    dates = [since + datetime.timedelta(days=i) for i in range((until - since).days)]
+    return dates, [counts.get(d, 0) for d in dates]
+
+
+def _query_daily_admissions(since: datetime.date = None):
+    db = SessionLocal()
+    try:
+        return daily_admissions(db, since)
+    finally:
+        db.close()
+
+
+def _format_rows(history_values, mean_forecast, lower, upper, days):
+    """Chart rows: the last 3 days of history followed by today and the future."""
+    today = datetime.datetime.now().date()
+    result = []
+
+    # Add last 3 days of historical for chart context
+    for i in range(3, 0, -1):
+        past_date = today - datetime.timedelta(days=i)
+        result.append({
+            "date": past_date.strftime("%a"),
+            "actual": history_values[-i] if len(history_values) >= i else None,
+            "predicted": None,
+            "lower": None,
+            "upper": None
+        })
+
+    # Add today and future
+    for i in range(days):
+        future_date = today + datetime.timedelta(days=i)
+        result.append({
+            "date": future_date.strftime("%a"),
+            "actual": history_values[-1] if i == 0 and history_values else None, # Mock actual for today
+            "predicted": int(mean_forecast[i]),
+            "lower": max(0, int(lower[i])),
+            "upper": int(upper[i])
+        })
+
+    return result
+
+
 class AdmissionForecaster:
-    def __init__(self):
+    def __init__(self, history_dates=None, history_values=None, order=ARIMA_ORDER):
         self.model = None
-        self.history_dates = []
-        self.history_values = []
+        self.order = order
         self.rmse = 0.0
         self.mae = 0.0
-        self._generate_synthetic_history()
-        self._train_model()
+        # Number of history points the ARIMA parameters were last fitted on
+        self.fitted_points = 0
+        if history_values is None:
+            self.source = "synthetic"
+            self._generate_synthetic_history()
+        else:
+            self.source = "admissions"
+            self.history_dates = list(history_dates)
+            self.history_values = list(history_values)
+        self.fingerprint = self._fingerprint()
+        self._lock = threading.Lock()
 
     def _generate_synthetic_history(self):
         # Generate 60 days of synthetic admission data
         np.random.seed(42)
         base = datetime.datetime.now().date() - datetime.timedelta(days=60)
-        
+
         dates = [base + datetime.timedelta(days=i) for i in range(60)]
-        
+
         # Base trend + weekly seasonality + noise
         values = []
         for i, d in enumerate(dates):
             base_val = 120 + (i * 0.5) # slight upward trend
             # Weekend dip
-            if d.weekday() >= 5: 
+            if d.weekday() >= 5:
                 base_val -= 20
             # Noise
             base_val += np.random.normal(0, 15)
             values.append(max(50, int(base_val)))
-            
+
         self.history_dates = dates
         self.history_values = values
 
+    def _fingerprint(self):
+        """Identifies the training data and settings; a stored model is reused only if it matches."""
+        h = hashlib.sha1()
+        h.update(f"v{MODEL_VERSION}|{self.order}|".encode())
+        h.update(np.asarray(self.history_values, dtype=np.int64).tobytes())
+        return h.hexdigest()[:16]
+
     def _train_model(self):
         # Train ARIMA model
         history_series = pd.Series(self.history_values)
-        
+
         # Fit ARIMA(7,1,0) - accounting for weekly seasonality
-        self.model = ARIMA(history_series, order=(7,1,0)).fit()
-        
+        self.model = ARIMA(history_series, order=self.order).fit()
+        self.fitted_points = len(history_series)
+
         # Calculate mock metrics on training data
         predictions = self.model.predict(start=1, end=len(history_series)-1)
         actuals = history_series[1:]
-        
+
         errors = predictions - actuals
         self.mae = round(float(np.mean(np.abs(errors))), 1)
         self.rmse = round(float(np.sqrt(np.mean(errors**2))), 1)
 
-    def forecast(self, days=7):
-        """Returns 7-day forecast with confidence intervals."""
+    # ---- persistence ----
+
+    def model_path(self, model_dir=MODEL_DIR):
+        return os.path.join(model_dir, f"arima_{self.fingerprint}.pkl")
+
+    def save(self, model_dir=MODEL_DIR):
+        os.makedirs(model_dir, exist_ok=True)
+        payload = {
+            "version": MODEL_VERSION,
+            "fingerprint": self.fingerprint,
+            "model": self.model,
+            "rmse": self.rmse,
+            "mae": self.mae,
+            "fitted_points": self.fitted_points,
+        }
+        # Write then rename so concurrent workers never read a partial file
+        fd, tmp = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f)
+        os.replace(tmp, self.model_path(model_dir))
+        self._prune(model_dir)
+
+    def _prune(self, model_dir=MODEL_DIR):
+        """Every new day of data is a new fingerprint; drop all but the newest MODELS_KEPT files."""
+        current = self.model_path(model_dir)
+        paths = sorted(glob.glob(os.path.join(model_dir, "arima_*.pkl")), key=os.path.getmtime, reverse=True)
+        stale = [p for p in paths if p != current][max(0, MODELS_KEPT - 1):]
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already gone, e.g. pruned by another worker
+
+    def load(self, model_dir=MODEL_DIR) -> bool:
+        path = self.model_path(model_dir)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception:
+            return False
+        if payload.get("version") != MODEL_VERSION or payload.get("fingerprint") != self.fingerprint:
+            return False
+        self.model = payload["model"]
+        self.rmse = payload["rmse"]
+        self.mae = payload["mae"]
+        self.fitted_points = payload.get("fitted_points", len(self.history_values))
+        return True
+
+    def ensure_model(self, model_dir=MODEL_DIR):
+        """
+        Loads the stored model for this data, fitting and storing it only if
+        there is none. model_dir=None fits in memory without touching disk.
+        """
+        if self.model is not None:
+            return self
+        with self._lock:
+            if self.model is None and (model_dir is None or not self.load(model_dir)):
+                self._train_model()
+                self._try_save(model_dir)
+        return self
+
+    def _try_save(self, model_dir=MODEL_DIR):
+        if model_dir is None:
+            return
+        try:
+            self.save(model_dir)
+        except OSError:
+            pass  # read-only deployments still work, they just refit on start
+
+    def extend(self, dates, values, model_dir=MODEL_DIR) -> int:
+        """
+        Adds newly completed days to the history. The fitted ARIMA state is
+        extended with the new observations (same parameters, no refit) unless
+        REFIT_AFTER_DAYS have accumulated since the last full fit. Returns the
+        number of days added.
+        """
+        last = self.history_dates[-1] if self.history_dates else None
+        new = [(d, v) for d, v in zip(dates, values) if last is None or d > last]
+        if not new:
+            return 0
+        with self._lock:
+            self.history_dates.extend(d for d, _ in new)
+            self.history_values.extend(v for _, v in new)
+            self.fingerprint = self._fingerprint()
+            if self.model is not None:
+                appended = len(self.history_values) - self.fitted_points
+                if REFIT_AFTER_DAYS and appended >= REFIT_AFTER_DAYS:
+                    self._train_model()
+                else:
+                    self.model = self.model.append(np.asarray([v for _, v in new], dtype=float), refit=False)
+                self._try_save(model_dir)
+        return len(new)
+
+    def refit(self, model_dir=MODEL_DIR):
+        """Full refit on the whole history, e.g. from a nightly job."""
+        with self._lock:
+            self._train_model()
+            self._try_save(model_dir)
+        return self
+
+    def forecast(self, days=7, confidence=0.95):
+        """Returns a `days`-day forecast with confidence intervals (95% by default)."""
+        self.ensure_model()
         forecast = self.model.get_forecast(steps=days)
         mean_forecast = forecast.predicted_mean.values
-        conf_int = forecast.conf_int(alpha=0.05).values # 95% CI
-        
-        today = datetime.datetime.now().date()
-        result = []
-        
-        # Add last 3 days of historical for chart context
-        for i in range(3, 0, -1):
-            past_date = today - datetime.timedelta(days=i)
-            result.append({
-                "date": past_date.strftime("%a"),
-                "actual": self.history_values[-i],
-                "predicted": None,
-                "lower": None,
-                "upper": None
-            })
-            
-        # Add today and future
-        for i in range(days):
-            future_date = today + datetime.timedelta(days=i)
-            pred = int(mean_forecast[i])
-            lower = int(conf_int[i][0])
-            upper = int(conf_int[i][1])
-            
-            result.append({
-                "date": future_date.strftime("%a"),
-                "actual": self.history_values[-1] if i == 0 else None, # Mock actual for today
-                "predicted": pred,
-                "lower": max(0, lower),
-                "upper": upper
-            })
-            
-        return result
-        
-forecaster_instance = AdmissionForecaster()
+        conf_int = forecast.conf_int(alpha=1 - confidence).values
+
+        return _format_rows(self.history_values, mean_forecast, conf_int[:, 0], conf_int[:, 1], days)
+
+
+_forecaster = None
+_forecaster_synced_on = None
+_forecaster_lock = threading.Lock()
+
+
+def _build_forecaster() -> AdmissionForecaster:
+    dates, values = _query_daily_admissions()
+    if len(values) >= MIN_ARIMA_POINTS:
+        return AdmissionForecaster(dates, values)
+    # Not enough recorded admissions yet (fresh install / demo data)
+    return AdmissionForecaster()
+
+
+def get_forecaster() -> AdmissionForecaster:
+    """
+    Process-wide forecaster, created on first use from the daily admission
+    counts (synthetic history until there are MIN_ARIMA_POINTS days). Once a
+    day it picks up the newly completed days from the database and extends
+    the model with them. The ARIMA fit is loaded from MODEL_DIR when the
+    training data is unchanged, so importing this module (and starting a
+    worker) no longer fits anything.
+    """
+    global _forecaster, _forecaster_synced_on
+    today = datetime.date.today()
+    if _forecaster is None or _forecaster_synced_on != today:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = _build_forecaster()
+            elif _forecaster_synced_on != today:
+                if _forecaster.source == "synthetic":
+                    _forecaster = _build_forecaster()
+                else:
+                    since = _forecaster.history_dates[-1] + datetime.timedelta(days=1)
+                    _forecaster.ensure_model().extend(*_query_daily_admissions(since))
+            _forecaster_synced_on = today
+    return _forecaster.ensure_model()
+
+
+def current_forecaster():
+    """The process-wide forecaster if its model is already loaded, else None. Never fits."""
+    f = _forecaster
+    return f if f is not None and f.model is not None else None
+
+
+# ---- multi-series forecasting ----
+
+def share_series(base: AdmissionForecaster, share: float):
+    """
+    Per-ward / per-bed-type history approximated as `share` of the
+    hospital-wide series. Admissions are not recorded per ward (discharged
+    patients keep no bed link), so this is an apportionment rather than
+    observed ward data; responses say so in their data_source.
+    """
+    values = np.round(np.asarray(base.history_values, dtype=float) * share)
+    return base.history_dates, values.astype(int).tolist()
+
+
+def seasonal_naive_forecast(series_values: list, days: int, confidence: float = 0.95, season: int = 7):
+    """
+    Vectorized fallback for series too short for ARIMA. Series of equal
+    length are stacked into one array and forecast together: seasonal naive
+    with weekly drift when there is at least two seasons of data, otherwise
+    the series mean. Returns (mean, lower, upper, rmse) arrays per series.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    out = [None] * len(series_values)
+
+    by_length = {}
+    for i, values in enumerate(series_values):
+        by_length.setdefault(len(values), []).append(i)
+
+    h = np.arange(days)
+    for length, idx in by_length.items():
+        Y = np.asarray([series_values[i] for i in idx], dtype=float).reshape(len(idx), length)
+        if length == 0:
+            mean = np.zeros((len(idx), days))
+            sigma = np.zeros((len(idx), 1))
+            widen = np.ones(days)
+        elif length >= 2 * season:
+            last = Y[:, -season:]
+            drift = last.mean(axis=1) - Y[:, -2 * season:-season].mean(axis=1)
+            k = h // season + 1
+            mean = last[:, h % season] + drift[:, None] * k
+            sigma = (Y[:, season:] - Y[:, :-season]).std(axis=1)[:, None]
+            widen = np.sqrt(k)
+        else:
+            mean = np.repeat(Y.mean(axis=1)[:, None], days, axis=1)
+            sigma = Y.std(axis=1)[:, None]
+            widen = np.ones(days)
+        mean = np.maximum(mean, 0)
+        lower = mean - z * sigma * widen
+        upper = mean + z * sigma * widen
+        for row, i in enumerate(idx):
+            out[i] = (mean[row], lower[row], upper[row], round(float(sigma[row, 0]), 1))
+    return out
+
+
+def _arima_series_forecast(dates, values, days, confidence):
+    # Runs in a pool worker. Per-series fits are cheap and keyed on data
+    # that changes daily, so they stay in memory rather than in MODEL_DIR.
+    try:
+        f = AdmissionForecaster(dates, values).ensure_model(model_dir=None)
+        return f.forecast(days=days, confidence=confidence), f.rmse, f.mae
+    except Exception:
+        return None  # e.g. a flat series ARIMA cannot fit; the caller falls back
+
+
+class MultiSeriesForecaster:
+    """
+    Forecasts many admission series (per ward, per bed type, ...) in one
+    batch. ARIMA fits run in parallel on a process pool; series shorter than
+    MIN_ARIMA_POINTS go through the vectorized seasonal-naive fallback.
+    """
+
+    def __init__(self, max_workers: int = FORECAST_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def forecast(self, series: dict, days: int = 7, confidence: float = 0.95) -> dict:
+        """series: key -> (dates, values). Returns key -> {"model", "metrics", "data"}."""
+        arima_keys = [k for k, (_, v) in series.items() if len(v) >= MIN_ARIMA_POINTS]
+        short_keys = [k for k in series if k not in set(arima_keys)]
+        results = {}
+
+        if arima_keys:
+            args = [(series[k][0], series[k][1], days, confidence) for k in arima_keys]
+            if len(args) > 1 and self.max_workers > 1:
+                outputs = list(self._get_pool().map(_arima_series_forecast, *zip(*args)))
+            else:
+                outputs = [_arima_series_forecast(*a) for a in args]
+            for k, output in zip(arima_keys, outputs):
+                if output is None:
+                    short_keys.append(k)
+                    continue
+                rows, rmse, mae = output
+                results[k] = {"model": "arima", "metrics": {"rmse": rmse, "mae": mae}, "data": rows}
+
+        if short_keys:
+            fallback = seasonal_naive_forecast([series[k][1] for k in short_keys], days, confidence)
+            for k, (mean, lower, upper, rmse) in zip(short_keys, fallback):
+                results[k] = {
+                    "model": "seasonal_naive",
+                    "metrics": {"rmse": rmse, "mae": None},
+                    "data": _format_rows(series[k][1], mean, lower, upper, days),
+                }
+
+        return {k: results[k] for k in series}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+multi_forecaster = MultiSeriesForecaster()
@@ -0,0 +1,353 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+from .milp_allocator import pair_score, is_compatible
+from .solvers import solve_allocation
+
+EPS = 1e-9
+# Longest pure bed-type cycle polish() looks for
+MAX_CYCLE_TYPES = 4
+
+
+class AllocationState:
+    """
+    Keeps the last optimal allocation in memory and repairs it when a single
+    patient or bed is added or removed, instead of re-solving from scratch.
+
+    Scores only depend on the bed type, so the assignment is a transportation
+    problem between patients and bed types. The current solution is optimal
+    as long as its residual graph has no positive cycle, and a single delta
+    can be repaired with one best augmenting path found by Bellman-Ford over
+    the (few) bed-type nodes - the same step successive-shortest-path min-cost
+    flow uses. Concrete bed ids are handed out from per-type free pools.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.version = 0         # bumped by every load and delta
+        self._reset()
+
+    def _reset(self):
+        self.patients = {}       # pid -> patient dict
+        self.scores = {}         # pid -> {bed_type: score} for compatible types
+        self.beds = {}           # bed_id -> bed dict
+        self.free = {}           # bed_type -> OrderedDict of unrecommended bed ids
+        self.members = {}        # bed_type -> {pid: bed_id}
+        self.assigned = {}       # pid -> bed_id
+        self.objective = 0.0
+        self._edges = None       # cached residual arcs, dropped on every move
+        self._cheapest = {}      # bed_type -> members sorted by score, same lifetime
+
+    # ---- bulk load ----
+
+    def load(self, patients: list, beds: list, assignments: dict = None, time_limit: float = None,
+             expected_version: int = None) -> bool:
+        """
+        Replaces the state with a snapshot. Without assignments it cold-solves
+        once, giving up on exactness after time_limit seconds if one is set.
+        With expected_version it only loads if no delta arrived since that
+        version was read, and returns whether it did.
+        """
+        with self.lock:
+            if expected_version is not None and self.version != expected_version:
+                return False
+            if assignments is None:
+                assignments = solve_allocation(patients, beds, time_limit=time_limit)["assignments"] if patients and beds else {}
+            self._reset()
+            for b in beds:
+                self._register_bed(b)
+            for p in patients:
+                self._register_patient(p)
+            for pid, bed_id in assignments.items():
+                if pid in self.patients and bed_id in self.beds:
+                    bed_type = self.beds[bed_id]['bed_type']
+                    self.free[bed_type].pop(bed_id, None)
+                    self._place(pid, bed_type, bed_id)
+            self.loaded = True
+            self.version += 1
+            return True
+
+    def _register_bed(self, bed: dict):
+        self.beds[bed['id']] = bed
+        self.free.setdefault(bed['bed_type'], OrderedDict())[bed['id']] = True
+        self.members.setdefault(bed['bed_type'], {})
+
+    def _register_patient(self, patient: dict):
+        self.patients[patient['id']] = patient
+        self.scores[patient['id']] = {
+            t: pair_score(patient, t) for t in self.free if is_compatible(patient, t)
+        }
+
+    # ---- low level moves ----
+
+    def _place(self, pid: str, bed_type: str, bed_id: str = None):
+        if bed_id is None:
+            bed_id, _ = self.free[bed_type].popitem(last=False)
+        self.members[bed_type][pid] = bed_id
+        self.assigned[pid] = bed_id
+        self.objective += self.scores[pid][bed_type]
+        self._invalidate()
+
+    def _unplace(self, pid: str):
+        bed_id = self.assigned.pop(pid, None)
+        if bed_id is None:
+            return
+        bed_type = self.beds[bed_id]['bed_type']
+        del self.members[bed_type][pid]
+        self.free[bed_type][bed_id] = True
+        self.objective -= self.scores[pid][bed_type]
+        self._invalidate()
+
+    def _invalidate(self):
+        self._edges = None
+        self._cheapest = {}
+
+    def _type_of(self, pid: str):
+        bed_id = self.assigned.get(pid)
+        return self.beds[bed_id]['bed_type'] if bed_id else None
+
+    # ---- augmenting paths ----
+
+    def _move_edges(self):
+        """
+        Best single move between bed types: edge (t, t2) -> (gain, pid) where
+        pid currently in t would move to t2. These are the residual arcs of the
+        current optimal solution.
+        """
+        if self._edges is not None:
+            return self._edges
+        edges = {}
+        for t, members in self.members.items():
+            for pid in members:
+                s = self.scores[pid]
+                for t2, score in s.items():
+                    if t2 == t:
+                        continue
+                    gain = score - s[t]
+                    if (t, t2) not in edges or gain > edges[(t, t2)][0]:
+                        edges[(t, t2)] = (gain, pid)
+        self._edges = edges
+        return edges
+
+    def _eject_candidate(self, bed_type: str, exclude: set):
+        """Lowest-scoring member of bed_type not in exclude, i.e. the cheapest one to bump."""
+        if bed_type not in self._cheapest:
+            members = self.members[bed_type]
+            self._cheapest[bed_type] = sorted(members, key=lambda q: self.scores[q][bed_type])
+        for q in self._cheapest[bed_type]:
+            if q not in exclude:
+                return q
+        return None
+
+    def _bellman_ford(self, labels: dict):
+        """
+        labels: bed_type -> (gain, path, visited) where path is a list of
+        (pid, bed_type) entries and visited the bed types it touches. Extends
+        them along move edges and returns the best simple path per type.
+        """
+        edges = self._move_edges()
+        for _ in range(len(self.free)):
+            changed = False
+            for (t, t2), (gain, pid) in edges.items():
+                if t not in labels or t2 in labels[t][2]:
+                    continue
+                cand = labels[t][0] + gain
+                if t2 not in labels or cand > labels[t2][0] + EPS:
+                    labels[t2] = (cand, labels[t][1] + [(pid, t2)], labels[t][2] | {t2})
+                    changed = True
+            if not changed:
+                break
+        return labels
+
+    def _apply_path(self, path: list, eject: str = None):
+        """Applies a path back to front so every move has a free bed to go to."""
+        if eject is not None:
+            self._unplace(eject)
+        for pid, bed_type in reversed(path):
+            self._unplace(pid)
+            self._place(pid, bed_type)
+
+    def _augment_from_patient(self, pid: str):
+        """Best way to fit pid in: a free bed directly, via a chain of moves, or by bumping someone."""
+        labels = {t: (score, [(pid, t)], {t}) for t, score in self.scores[pid].items()}
+        labels = self._bellman_ford(labels)
+
+        best_gain, best_path, best_eject = 0.0, None, None
+        for t, (gain, path, _) in labels.items():
+            if self.free[t]:
+                total, eject = gain, None
+            else:
+                eject = self._eject_candidate(t, {q for q, _ in path})
+                if eject is None:
+                    continue
+                total = gain - self.scores[eject][t]
+            if total > best_gain + EPS:
+                best_gain, best_path, best_eject = total, path, eject
+
+        if best_path:
+            self._apply_path(best_path, best_eject)
+            return True
+        return False
+
+    def _free_bed_labels(self):
+        """
+        Best gain per bed type for filling one extra free bed there: pull in a
+        waiting patient or move someone over, possibly via a chain of moves.
+        """
+        # A chain may start by vacating a bed that then stays empty (gain 0)
+        labels = {t: (0.0, [], {t}) for t in self.members if self.members[t]}
+        for pid, s in self.scores.items():
+            if pid in self.assigned:
+                continue
+            for t, score in s.items():
+                if t not in labels or score > labels[t][0] + EPS:
+                    labels[t] = (score, [(pid, t)], {t})
+        return self._bellman_ford(labels)
+
+    def _augment_into_free_bed(self, bed_type: str):
+        labels = self._free_bed_labels()
+        if bed_type in labels and labels[bed_type][0] > EPS:
+            self._apply_path(labels[bed_type][1])
+            return True
+        return False
+
+    def _shrink_chain(self):
+        """
+        Applies the best chain that vacates a bed, moves patients along and
+        finally bumps someone back to the queue. Only improving when the
+        current solution placed a low-scoring patient somewhere expensive.
+        """
+        labels = self._bellman_ford({t: (0.0, [], {t}) for t in self.members if self.members[t]})
+        best_gain, best_path, best_eject = EPS, None, None
+        for t, (gain, path, _) in labels.items():
+            if not path:
+                continue
+            eject = self._eject_candidate(t, {q for q, _ in path})
+            if eject is not None and gain - self.scores[eject][t] > best_gain:
+                best_gain, best_path, best_eject = gain - self.scores[eject][t], path, eject
+        if best_path is None:
+            return False
+        self._apply_path(best_path, best_eject)
+        return True
+
+    def _cancel_cycle(self):
+        """Applies the best improving cycle of moves between bed types, if any."""
+        edges = self._move_edges()
+        types = list(self.members)
+        best_gain, best_cycle = EPS, None
+        for length in range(2, min(len(types), MAX_CYCLE_TYPES) + 1):
+            for cycle in itertools.permutations(types, length):
+                # Each cycle is seen once per rotation; only score the one starting at its smallest type
+                if cycle[0] != min(cycle):
+                    continue
+                arcs = [edges.get((cycle[i], cycle[(i + 1) % length])) for i in range(length)]
+                if None in arcs:
+                    continue
+                gain = sum(a[0] for a in arcs)
+                if gain > best_gain:
+                    best_gain, best_cycle = gain, [(a[1], cycle[(i + 1) % length]) for i, a in enumerate(arcs)]
+        if best_cycle is None:
+            return False
+        for pid, _ in best_cycle:
+            self._unplace(pid)
+        for pid, bed_type in best_cycle:
+            self._place(pid, bed_type)
+        return True
+
+    def polish(self):
+        """
+        Turns any feasible assignment (e.g. merged sub-solutions) into an
+        optimal one by applying improving paths and cycles until none remain.
+        """
+        with self.lock:
+            improved = True
+            while improved:
+                improved = False
+                waiting = [pid for pid in self.patients if pid not in self.assigned and self.scores[pid]]
+                waiting.sort(key=lambda pid: -max(self.scores[pid].values()))
+                for pid in waiting:
+                    improved |= self._augment_from_patient(pid)
+                for t in list(self.free):
+                    if self.free[t]:
+                        improved |= self._augment_into_free_bed(t)
+                improved |= self._shrink_chain()
+                improved |= self._cancel_cycle()
+
+    # ---- public deltas ----
+
+    def add_patient(self, patient: dict):
+        with self.lock:
+            self.version += 1
+            if not self.loaded:
+                return
+            self.remove_patient(patient['id'])
+            self._register_patient(patient)
+            self._augment_from_patient(patient['id'])
+
+    def remove_patient(self, pid: str):
+        """Patient left the queue (assigned for real, discharged, ...)."""
+        with self.lock:
+            self.version += 1
+            if pid not in self.patients:
+                return
+            bed_type = self._type_of(pid)
+            self._unplace(pid)
+            del self.patients[pid]
+            del self.scores[pid]
+            if bed_type is not None:
+                self._augment_into_free_bed(bed_type)
+
+    def add_bed(self, bed: dict):
+        """A bed became Available."""
+        with self.lock:
+            self.version += 1
+            if not self.loaded or bed['id'] in self.beds:
+                return
+            new_type = bed['bed_type'] not in self.free
+            self._register_bed(bed)
+            if new_type:
+                # Scores were only computed for known bed types
+                for pid, patient in self.patients.items():
+                    if is_compatible(patient, bed['bed_type']):
+                        self.scores[pid][bed['bed_type']] = pair_score(patient, bed['bed_type'])
+                # The cached residual arcs have no edges into the new type yet
+                self._invalidate()
+            self._augment_into_free_bed(bed['bed_type'])
+
+    def remove_bed(self, bed_id: str):
+        """A bed stopped being Available. Whoever it was recommended to is re-placed."""
+        with self.lock:
+            self.version += 1
+            bed = self.beds.get(bed_id)
+            if bed is None:
+                return
+            holder = next((pid for pid, b in self.members[bed['bed_type']].items() if b == bed_id), None)
+            if holder is not None:
+                self._unplace(holder)
+            self.free[bed['bed_type']].pop(bed_id, None)
+            del self.beds[bed_id]
+            if holder is not None:
+                self._augment_from_patient(holder)
+
+    # ---- reads ----
+
+    def recommendation(self, pid: str):
+        return self.assigned.get(pid)
+
+    def assignments(self) -> dict:
+        with self.lock:
+            return dict(self.assigned)
+
+    def shadow_prices(self) -> dict:
+        """
+        Dual value of each bed type's capacity: how much the objective would
+        improve with one more free bed of that type.
+        """
+        with self.lock:
+            labels = self._free_bed_labels()
+            return {t: round(max(labels.get(t, (0.0,))[0], 0.0), 2) for t in self.free}
+
+
+allocation_state = AllocationState()
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .solvers import solve_allocation
+from .decomposition import solve_decomposed
+
+# Pool size and limits, overridable per deployment
+MAX_WORKERS = int(os.getenv("ALLOCATION_WORKERS", min(4, os.cpu_count() or 1)))
+MAX_PENDING_JOBS = int(os.getenv("ALLOCATION_MAX_PENDING", 32))
+DEFAULT_TIME_LIMIT = float(os.getenv("ALLOCATION_TIME_LIMIT", 10))
+# Finished jobs kept around for polling
+JOB_HISTORY = 200
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def snapshot_key(patients: list, beds: list, engine: str, time_limit: float, decompose: bool = False) -> str:
+    """Stable fingerprint of a queue/bed snapshot, used to join duplicate jobs."""
+    payload = json.dumps({
+        "patients": sorted(patients, key=lambda p: p['id']),
+        "beds": sorted(beds, key=lambda b: b['id']),
+        "engine": engine,
+        "time_limit": time_limit,
+        "decompose": decompose,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class AllocationJobQueue:
+    """
+    Runs allocation solves on a bounded process pool so the API's event loop
+    and threadpool stay free. Submitting the same snapshot while a job for it
+    is still running returns the in-flight job instead of starting another.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING_JOBS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = None
+        self.jobs = OrderedDict()
+        self._futures = {}
+        self._in_flight = {}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Registers an async callback(job) fired when a job finishes."""
+        self._listeners.append(callback)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def pending_count(self) -> int:
+        return len(self._in_flight)
+
+    def submit(self, patients: list, beds: list, engine: str = "auto", time_limit: float = None,
+               decompose: bool = False) -> dict:
+        """Must be called from the event loop. Returns the (possibly shared) job record."""
+        time_limit = DEFAULT_TIME_LIMIT if time_limit is None else time_limit
+        key = snapshot_key(patients, beds, engine, time_limit, decompose)
+
+        if key in self._in_flight:
+            job = self.jobs[self._in_flight[key]]
+            job["joined"] += 1
+            return job
+
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError("Too many allocation jobs in flight")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "pending",
+            "engine": engine,
+            "time_limit": time_limit,
+            "decompose": decompose,
+            "patients": len(patients),
+            "beds": len(beds),
+            "joined": 0,
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self.jobs[job_id] = job
+        self._in_flight[key] = job_id
+
+        loop = asyncio.get_running_loop()
+        solve = solve_decomposed if decompose else solve_allocation
+        future = loop.run_in_executor(self._get_pool(), solve, patients, beds, engine, time_limit)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finish(key, job_id, f))
+        return job
+
+    def _finish(self, key: str, job_id: str, future):
+        job = self.jobs[job_id]
+        self._in_flight.pop(key, None)
+        self._futures.pop(job_id, None)
+        job["finished_at"] = time.time()
+        try:
+            job["result"] = future.result()
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+
+        self._trim_history()
+        for callback in self._listeners:
+            asyncio.ensure_future(callback(job))
+
+    def _trim_history(self):
+        while len(self.jobs) > JOB_HISTORY:
+            oldest = next(iter(self.jobs.values()))
+            if oldest["status"] == "pending":
+                break
+            self.jobs.popitem(last=False)
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> dict:
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                await asyncio.shield(future)
+            except Exception:
+                pass
+        return self.jobs[job_id]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+job_queue = AllocationJobQueue()
@@ -1,75 +1,159 @@
 import pulp
 
-def run_allocation(patients: list, beds: list):
+# Bonus for placing a triage level in an appropriate bed type. Any other
+# pairing is a mismatch and takes MISMATCH_PENALTY instead.
+TYPE_BONUS = {
+    "Red": {"ICU": 50, "Step-Down": 50},
+    "Yellow": {"General": 30, "Step-Down": 30},
+    "Green": {"General": 20},
+}
+MISMATCH_PENALTY = -100
+WAIT_WEIGHT = 0.5
+
+
+def pair_score(patient: dict, bed_type: str) -> float:
+    """Objective coefficient for putting `patient` in a bed of `bed_type`."""
+    score = patient['acuity_score']
+    score += TYPE_BONUS.get(patient['triage_level'], {}).get(bed_type, MISMATCH_PENALTY)
+    # Bonus for prioritizing those who waited longer
+    score += patient.get('wait_time_mins', 0) * WAIT_WEIGHT
+    return score
+
+
+def is_forbidden(patient: dict, bed_type: str) -> bool:
+    """Hard constraint: Red triage must never be placed in a General bed."""
+    return patient['triage_level'] == 'Red' and bed_type == 'General'
+
+
+def is_compatible(patient: dict, bed_type: str) -> bool:
     """
-    patients: list of dicts [{"id": "P1", "triage_level": "Red", "acuity_score": 90, "wait_time_mins": 15}]
-    beds: list of dicts [{"id": "B1", "ward_id": "W1", "bed_type": "ICU"}]
-    
-    Returns: dict mapping patient_id to assigned bed_id, and objective value
+    A pair only gets a decision variable if it is allowed and can improve the
+    objective. Pairs with a non-positive score are never part of a strictly
+    better solution, so dropping them leaves the optimum unchanged.
     """
-    if not patients or not beds:
-        return {}, 0.0
+    return not is_forbidden(patient, bed_type) and pair_score(patient, bed_type) > 0
+
+
+def build_bed_classes(beds: list):
+    """
+    Groups interchangeable beds (same ward_id + bed_type) into capacity classes.
+    Returns a list of {"key": (ward_id, bed_type), "bed_type": ..., "bed_ids": [...]}
+    preserving the input order of beds within each class.
+    """
+    classes = {}
+    for b in beds:
+        key = (b['ward_id'], b['bed_type'])
+        if key not in classes:
+            classes[key] = {"key": key, "ward_id": b['ward_id'], "bed_type": b['bed_type'], "bed_ids": []}
+        classes[key]["bed_ids"].append(b['id'])
+    return list(classes.values())
+
+
+def expand_class_assignments(class_assignments: dict, bed_classes: list):
+    """
+    Turns {patient_id: class_index} into {patient_id: bed_id} by handing out
+    the beds of each class in order.
+    """
+    cursors = [0] * len(bed_classes)
+    assignments = {}
+    for pid, ci in class_assignments.items():
+        assignments[pid] = bed_classes[ci]["bed_ids"][cursors[ci]]
+        cursors[ci] += 1
+    return assignments
+
+
+def build_pairs(patients: list, bed_classes: list):
+    """
+    Sparse objective coefficients {(patient_id, class_index): score} for every
+    compatible patient/class pair.
+    """
+    pairs = {}
+    for p in patients:
+        for ci, c in enumerate(bed_classes):
+            if is_compatible(p, c['bed_type']):
+                pairs[(p['id'], ci)] = pair_score(p, c['bed_type'])
+    return pairs
+
+
+def upper_bound(pairs: dict) -> float:
+    """Cheap valid bound: every patient gets their best compatible class."""
+    best = {}
+    for (pid, _), score in pairs.items():
+        best[pid] = max(best.get(pid, 0.0), score)
+    return float(sum(best.values()))
 
-    # 1. Initialize Problem
+
+def build_class_model(bed_classes: list, pairs: dict):
+    """Builds the aggregated transportation model. Returns (problem, variables)."""
     prob = pulp.LpProblem("Bed_Allocation", pulp.LpMaximize)
 
-    # 2. Decision Variables
-    # x[p][b] = 1 if patient p is assigned to bed b, 0 otherwise
-    x = pulp.LpVariable.dicts("assign",
-                              ((p['id'], b['id']) for p in patients for b in beds),
-                              cat='Binary')
+    # x[p][c] = 1 if patient p is assigned to a bed of class c. Only compatible
+    # pairs get a variable, so forbidden pairs need no explicit == 0 constraint.
+    x = pulp.LpVariable.dicts("assign", list(pairs.keys()), cat='Binary')
 
-    # 3. Objective Function
     # Maximize survival probability (acuity_score match) and minimize wait time penalization
-    # Assuming high acuity score means higher priority.
-    objective_terms = []
-    for p in patients:
-        for b in beds:
-            # Base score matching priority
-            score = p['acuity_score']
-            
-            # Bonus for matching appropriate bed type
-            if p['triage_level'] == 'Red' and b['bed_type'] in ['ICU', 'Step-Down']:
-                score += 50
-            elif p['triage_level'] == 'Yellow' and b['bed_type'] in ['General', 'Step-Down']:
-                score += 30
-            elif p['triage_level'] == 'Green' and b['bed_type'] == 'General':
-                score += 20
-            else:
-                score -= 100 # Penalty for mismatch
-                
-            # Bonus for prioritizing those who waited longer
-            score += p.get('wait_time_mins', 0) * 0.5
-            
-            objective_terms.append(score * x[(p['id'], b['id'])])
-
-    prob += pulp.lpSum(objective_terms)
-
-    # 4. Constraints
+    prob += pulp.lpSum(score * x[key] for key, score in pairs.items())
+
+    by_patient = {}
+    by_class = {}
+    for (pid, ci) in pairs:
+        by_patient.setdefault(pid, []).append(x[(pid, ci)])
+        by_class.setdefault(ci, []).append(x[(pid, ci)])
+
     # A patient can be assigned to at most 1 bed
-    for p in patients:
-        prob += pulp.lpSum([x[(p['id'], b['id'])] for b in beds]) <= 1
+    for pid, vars_ in by_patient.items():
+        prob += pulp.lpSum(vars_) <= 1
 
-    # A bed can have at most 1 patient
-    for b in beds:
-        prob += pulp.lpSum([x[(p['id'], b['id'])] for p in patients]) <= 1
+    # A bed class can hold at most as many patients as it has beds
+    for ci, vars_ in by_class.items():
+        prob += pulp.lpSum(vars_) <= len(bed_classes[ci]['bed_ids'])
 
-    # Hard constraints: Red triage must not go to General if ICU/Step-Down available
-    # For a real hackathon, keep it simple: just let the objective weights handle it, 
-    # but strictly prevent highly inappropriate assignments.
-    for p in patients:
-        for b in beds:
-            if p['triage_level'] == 'Red' and b['bed_type'] == 'General':
-                prob += x[(p['id'], b['id'])] == 0
+    return prob, x
 
-    # 5. Solve
-    prob.solve(pulp.PULP_CBC_CMD(msg=False))
 
-    # 6. Extract Results
-    assignments = {}
-    for p in patients:
-        for b in beds:
-            if pulp.value(x[(p['id'], b['id'])]) == 1:
-                assignments[p['id']] = b['id']
+def run_class_model(prob, x, time_limit: float = None):
+    """
+    Solves a model from build_class_model with CBC. With a time_limit CBC
+    stops early and returns its incumbent.
+    Returns ({patient_id: class_index}, objective value, proven_optimal).
+    """
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+
+    class_assignments = {}
+    for (pid, ci), var in x.items():
+        if pulp.value(var) is not None and pulp.value(var) > 0.5:
+            class_assignments[pid] = ci
+
+    objective = pulp.value(prob.objective) if class_assignments else 0.0
+    return class_assignments, objective, prob.sol_status == pulp.LpSolutionOptimal
+
+
+def solve_class_model(bed_classes: list, pairs: dict, time_limit: float = None):
+    """Builds and solves the aggregated model with CBC."""
+    if not pairs:
+        return {}, 0.0, True
+    prob, x = build_class_model(bed_classes, pairs)
+    return run_class_model(prob, x, time_limit=time_limit)
+
+
+def run_allocation(patients: list, beds: list):
+    """
+    patients: list of dicts [{"id": "P1", "triage_level": "Red", "acuity_score": 90, "wait_time_mins": 15}]
+    beds: list of dicts [{"id": "B1", "ward_id": "W1", "bed_type": "ICU"}]
+
+    Returns: dict mapping patient_id to assigned bed_id, and objective value
+    """
+    if not patients or not beds:
+        return {}, 0.0
+
+    # 1. Aggregate beds into (ward_id, bed_type) capacity classes
+    bed_classes = build_bed_classes(beds)
+
+    # 2. Objective coefficients for compatible pairs only
+    pairs = build_pairs(patients, bed_classes)
+
+    # 3. Solve the transportation model
+    class_assignments, objective, _ = solve_class_model(bed_classes, pairs)
 
-    return assignments, pulp.value(prob.objective)
+    # 4. Hand out concrete beds from each class
+    return expand_class_assignments(class_assignments, bed_classes), objective
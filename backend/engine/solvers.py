@@ -0,0 +1,276 @@
+import numpy as np
+
+from .milp_allocator import (
+    TYPE_BONUS, MISMATCH_PENALTY, WAIT_WEIGHT,
+    build_bed_classes, build_pairs, build_class_model, expand_class_assignments, is_forbidden, run_class_model,
+    upper_bound,
+)
+
+try:
+    from scipy.optimize import linear_sum_assignment, linprog
+    from scipy.sparse import csr_matrix
+except ImportError:  # scipy is optional, CBC still works without it
+    linear_sum_assignment = linprog = None
+
+# Largest patient x bed-slot score matrix the Hungarian engine will build.
+# Beyond this "auto" moves on to the patient x bed-type transportation LP.
+HUNGARIAN_MAX_CELLS = 20_000_000
+
+
+def _spread_over_classes(patients: list, bed_classes: list, bed_types: list, rows, types) -> dict:
+    """Spreads each bed type's winners (patient row, type index) over its classes in order."""
+    remaining = [len(c['bed_ids']) for c in bed_classes]
+    classes_by_type = {i: [ci for ci, c in enumerate(bed_classes) if c['bed_type'] == bt]
+                       for i, bt in enumerate(bed_types)}
+    class_assignments = {}
+    for r, t in zip(list(rows), list(types)):
+        candidates = classes_by_type[int(t)]
+        while remaining[candidates[0]] == 0:
+            candidates.pop(0)
+        ci = candidates[0]
+        remaining[ci] -= 1
+        class_assignments[patients[int(r)]['id']] = ci
+    return class_assignments
+
+
+class SolverBackend:
+    """
+    Interface for assignment engines. A backend receives the aggregated
+    (ward_id, bed_type) bed classes and returns
+    ({patient_id: class_index}, objective value, proven_optimal).
+    time_limit (seconds) is a hint; exact polynomial engines may ignore it.
+
+    build() and run() split model construction from the solve so the two
+    can be timed separately; solve() does both.
+    """
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def supports(self, patients: list, bed_classes: list) -> bool:
+        return self.available()
+
+    def build(self, patients: list, bed_classes: list):
+        raise NotImplementedError
+
+    def run(self, model, time_limit: float = None):
+        raise NotImplementedError
+
+    def solve(self, patients: list, bed_classes: list, time_limit: float = None):
+        return self.run(self.build(patients, bed_classes), time_limit=time_limit)
+
+
+class CbcBackend(SolverBackend):
+    """PuLP + CBC on the sparse transportation model. Kept for side constraints."""
+    name = "cbc"
+
+    def build(self, patients: list, bed_classes: list):
+        pairs = build_pairs(patients, bed_classes)
+        return build_class_model(bed_classes, pairs) if pairs else None
+
+    def run(self, model, time_limit: float = None):
+        if model is None:
+            return {}, 0.0, True
+        prob, x = model
+        return run_class_model(prob, x, time_limit=time_limit)
+
+
+class HungarianBackend(SolverBackend):
+    """
+    Exact in-process engine: scipy's linear_sum_assignment over a
+    patient x bed-slot score matrix built with NumPy.
+
+    Every class of a given bed_type has the same score column, so only
+    min(total beds of that type, compatible patients) slots per type can ever
+    be used. The matrix is therefore at most patients x (bed types * patients)
+    wide no matter how many beds are free.
+    """
+    name = "hungarian"
+
+    def available(self) -> bool:
+        return linear_sum_assignment is not None
+
+    def supports(self, patients: list, bed_classes: list) -> bool:
+        if not self.available():
+            return False
+        capacity = {}
+        for c in bed_classes:
+            capacity[c['bed_type']] = capacity.get(c['bed_type'], 0) + len(c['bed_ids'])
+        slots = sum(min(cap, len(patients)) for cap in capacity.values())
+        return len(patients) * slots <= HUNGARIAN_MAX_CELLS
+
+    @staticmethod
+    def _bed_types(bed_classes: list):
+        return sorted({c['bed_type'] for c in bed_classes})
+
+    def _score_matrix(self, patients: list, bed_classes: list):
+        """Scores per (patient, bed_type); incompatible pairs are set to 0."""
+        bed_types = self._bed_types(bed_classes)
+        triage_levels = sorted({p['triage_level'] for p in patients})
+        t_index = {t: i for i, t in enumerate(triage_levels)}
+
+        bonus = np.array([[TYPE_BONUS.get(t, {}).get(bt, MISMATCH_PENALTY) for bt in bed_types]
+                          for t in triage_levels], dtype=float)
+        forbidden = np.array([[is_forbidden({'triage_level': t}, bt) for bt in bed_types]
+                              for t in triage_levels], dtype=bool)
+
+        tri = np.array([t_index[p['triage_level']] for p in patients])
+        acuity = np.array([p['acuity_score'] for p in patients], dtype=float)
+        wait = np.array([p.get('wait_time_mins', 0) for p in patients], dtype=float)
+
+        scores = acuity[:, None] + bonus[tri] + (wait * WAIT_WEIGHT)[:, None]
+        scores[(scores <= 0) | forbidden[tri]] = 0.0
+        return scores, bed_types
+
+    def _slot_counts(self, scores, bed_classes: list):
+        bed_types = self._bed_types(bed_classes)
+        capacity = np.zeros(len(bed_types), dtype=int)
+        for c in bed_classes:
+            capacity[bed_types.index(c['bed_type'])] += len(c['bed_ids'])
+        compatible = (scores > 0).sum(axis=0)
+        return np.minimum(capacity, compatible)
+
+    def build(self, patients: list, bed_classes: list):
+        if not patients or not bed_classes:
+            return None
+        scores, bed_types = self._score_matrix(patients, bed_classes)
+        slots = self._slot_counts(scores, bed_classes)
+        if slots.sum() == 0:
+            return None
+
+        # One column per usable bed slot, grouped by bed type
+        slot_type = np.repeat(np.arange(len(bed_types)), slots)
+        return {
+            "patients": patients,
+            "bed_classes": bed_classes,
+            "bed_types": bed_types,
+            "slot_type": slot_type,
+            "matrix": scores[:, slot_type],
+        }
+
+    def run(self, model, time_limit: float = None):
+        if model is None:
+            return {}, 0.0, True
+        patients, bed_classes, bed_types = model["patients"], model["bed_classes"], model["bed_types"]
+        slot_type, matrix = model["slot_type"], model["matrix"]
+        rows, cols = linear_sum_assignment(matrix, maximize=True)
+
+        gains = matrix[rows, cols]
+        keep = gains > 0
+        rows, types = rows[keep], slot_type[cols[keep]]
+
+        class_assignments = _spread_over_classes(patients, bed_classes, bed_types, rows, types)
+        return class_assignments, float(gains[keep].sum()), True
+
+
+class TransportBackend(HungarianBackend):
+    """
+    Exact engine for queues too large for the dense Hungarian matrix. Scores
+    only depend on the bed type, so the allocation is a transportation
+    problem: patients x bed types, one unit per patient and the type's free
+    beds as capacity. Its constraint matrix is totally unimodular, so the
+    LP (HiGHS simplex) has an integral optimal vertex. The model has at most
+    patients x bed types variables regardless of how many beds are free.
+    """
+    name = "transport"
+
+    def available(self) -> bool:
+        return linprog is not None
+
+    def supports(self, patients: list, bed_classes: list) -> bool:
+        return self.available()
+
+    def build(self, patients: list, bed_classes: list):
+        if not patients or not bed_classes:
+            return None
+        scores, bed_types = self._score_matrix(patients, bed_classes)
+        capacity = np.zeros(len(bed_types))
+        for c in bed_classes:
+            capacity[bed_types.index(c['bed_type'])] += len(c['bed_ids'])
+        rows, types = np.nonzero(scores > 0)
+        if not len(rows):
+            return None
+        n = len(rows)
+        # One constraint row per patient (at most one bed), then one per bed type (capacity)
+        a_ub = csr_matrix((np.ones(2 * n), (np.concatenate([rows, len(patients) + types]), np.tile(np.arange(n), 2))),
+                          shape=(len(patients) + len(bed_types), n))
+        b_ub = np.concatenate([np.ones(len(patients)), capacity])
+        return {
+            "patients": patients,
+            "bed_classes": bed_classes,
+            "bed_types": bed_types,
+            "rows": rows,
+            "types": types,
+            "gains": scores[rows, types],
+            "a_ub": a_ub,
+            "b_ub": b_ub,
+        }
+
+    def run(self, model, time_limit: float = None):
+        if model is None:
+            return {}, 0.0, True
+        options = {"time_limit": time_limit} if time_limit else {}
+        result = linprog(-model["gains"], A_ub=model["a_ub"], b_ub=model["b_ub"], bounds=(0, 1),
+                         method="highs-ds", options=options)
+        if result.x is None:
+            raise RuntimeError(f"Transportation solve failed: {result.message}")
+        chosen = result.x > 0.5
+        class_assignments = _spread_over_classes(model["patients"], model["bed_classes"], model["bed_types"],
+                                                 model["rows"][chosen], model["types"][chosen])
+        return class_assignments, float(model["gains"][chosen].sum()), result.status == 0
+
+
+BACKENDS = {
+    "hungarian": HungarianBackend(),
+    "transport": TransportBackend(),
+    "cbc": CbcBackend(),
+}
+
+# Order in which "auto" tries the engines; CBC on the (ward, bed_type) class
+# model is the last resort, used when scipy is missing
+AUTO_ORDER = ["hungarian", "transport", "cbc"]
+
+
+def select_backend(patients: list, bed_classes: list, engine: str = "auto") -> SolverBackend:
+    if engine != "auto":
+        if engine not in BACKENDS:
+            raise ValueError(f"Unknown solver engine '{engine}'. Choose one of: auto, {', '.join(BACKENDS)}")
+        backend = BACKENDS[engine]
+        if not backend.available():
+            raise ValueError(f"Solver engine '{engine}' is not available in this environment")
+        return backend
+
+    for name in AUTO_ORDER:
+        backend = BACKENDS[name]
+        if backend.supports(patients, bed_classes):
+            return backend
+    return BACKENDS["cbc"]
+
+
+def solve_allocation(patients: list, beds: list, engine: str = "auto", time_limit: float = None):
+    """
+    Runs the bed allocation on the chosen engine ("auto" picks the cheapest
+    exact one). Returns {"assignments", "objective_value", "engine", "optimal", "gap"}.
+    If time_limit cuts the solve short, the incumbent is returned and "gap"
+    is its relative distance to an upper bound on the optimum.
+    """
+    if not patients or not beds:
+        return {"assignments": {}, "objective_value": 0.0, "engine": None, "optimal": True, "gap": 0.0}
+
+    bed_classes = build_bed_classes(beds)
+    backend = select_backend(patients, bed_classes, engine)
+    class_assignments, objective, optimal = backend.solve(patients, bed_classes, time_limit=time_limit)
+
+    gap = 0.0
+    if not optimal:
+        bound = upper_bound(build_pairs(patients, bed_classes))
+        gap = round((bound - objective) / bound, 4) if bound > 0 else 0.0
+
+    return {
+        "assignments": expand_class_assignments(class_assignments, bed_classes),
+        "objective_value": objective,
+        "engine": backend.name,
+        "optimal": optimal,
+        "gap": gap,
+    }
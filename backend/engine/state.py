@@ -0,0 +1,238 @@
+"""
+Shared in-memory state behind the routers: the bed index, triage queue and
+live allocation are loaded from the database on first use, and every write
+path reflects its committed changes here through these helpers.
+"""
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, update, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..database import SessionLocal
+from ..models import Ward, Bed, Patient
+from ..events import bed_status_changed, patient_assigned
+from .bed_index import bed_index
+from .incremental import allocation_state
+from .jobs import DEFAULT_TIME_LIMIT
+from .triage_queue import triage_queue, wait_minutes
+
+# Short-lived; bed and patient write paths invalidate it right away
+wards_cache = TTLCache(maxsize=1, ttl=5)
+
+
+def ensure_bed_index(db: Session):
+    """Loads the in-memory bed index from the database on first use."""
+    if not bed_index.loaded:
+        with bed_index.lock:
+            if not bed_index.loaded:
+                wards = [{"id": w.id, "name": w.name, "capacity": w.capacity, "staff_ratio": w.staff_ratio}
+                         for w in db.query(Ward).all()]
+                beds = [dict(row._mapping) for row in
+                        db.execute(select(Bed.id, Bed.ward_id, Bed.bed_type, Bed.status, Bed.patient_id))]
+                bed_index.load(wards, beds)
+    return bed_index
+
+
+async def ensure_bed_index_async(db: AsyncSession):
+    if not bed_index.loaded:
+        await db.run_sync(ensure_bed_index)
+    return bed_index
+
+
+QUEUE_FIELDS = (Patient.id, Patient.name, Patient.age, Patient.condition,
+                Patient.triage_level, Patient.acuity_score, Patient.admission_time)
+
+
+def queue_entry(p) -> dict:
+    """Triage queue entry from a Patient or a row / dict with the same fields."""
+    get = p.get if isinstance(p, dict) else lambda k: getattr(p, k)
+    return {c.key: get(c.key) for c in QUEUE_FIELDS}
+
+
+def ensure_triage_queue(db: Session):
+    """Loads the in-memory triage queue from the database on first use."""
+    if not triage_queue.loaded:
+        with triage_queue.lock:
+            if not triage_queue.loaded:
+                rows = db.execute(select(*QUEUE_FIELDS).where(Patient.status == "In Queue"))
+                triage_queue.load([dict(row._mapping) for row in rows])
+    return triage_queue
+
+
+async def ensure_triage_queue_async(db: AsyncSession):
+    if not triage_queue.loaded:
+        await db.run_sync(ensure_triage_queue)
+    return triage_queue
+
+
+def sync_bed(bed_id: str, status: str, patient_id: str = None):
+    """
+    Reflects a committed bed change in the bed index, the live allocation
+    state and the wards cache, and publishes it on the event bus.
+    """
+    previous = bed_index.set_status(bed_id, status, patient_id)
+    bed = bed_index.get(bed_id)
+    if status == "Available" and previous != "Available":
+        if bed:
+            allocation_state.add_bed({"id": bed["id"], "ward_id": bed["ward_id"], "bed_type": bed["bed_type"]})
+    elif status != "Available":
+        allocation_state.remove_bed(bed_id)
+    wards_cache.invalidate()
+
+    if bed:
+        bed_status_changed(bed)
+        if status == "Occupied" and patient_id:
+            patient_assigned(patient_id, bed_id, bed["ward_id"])
+
+
+def patient_payload(p) -> dict:
+    """Allocator input for a Patient or a row / dict with the same fields; wait is minutes since admission."""
+    get = p.get if isinstance(p, dict) else lambda k: getattr(p, k)
+    return {"id": get("id"), "triage_level": get("triage_level"), "acuity_score": get("acuity_score"),
+            "wait_time_mins": wait_minutes(get("admission_time"))}
+
+
+def query_snapshot(db: Session):
+    # 1. Gather all queue patients from the in-memory triage queue
+    patients = [patient_payload(p) for p in ensure_triage_queue(db).page()[0]]
+
+    # 2. Gather all available beds from the in-memory bed index
+    beds = [{"id": b["id"], "ward_id": b["ward_id"], "bed_type": b["bed_type"]}
+            for b in ensure_bed_index(db).beds(status="Available")]
+    return patients, beds
+
+
+def ensure_allocation_state(db: Session, time_limit: float = None):
+    """Loads the incremental allocation state from the database on first use."""
+    if not allocation_state.loaded:
+        with allocation_state.lock:
+            if not allocation_state.loaded:
+                allocation_state.load(*query_snapshot(db), time_limit=time_limit)
+    return allocation_state
+
+
+_allocation_load = None
+
+
+def start_allocation_state_load():
+    """
+    Cold-solves the allocation state in the threadpool, capped at the job
+    time limit, without waiting for it. Async readers call this and serve
+    without recommendations until allocation_state.loaded flips.
+    """
+    global _allocation_load
+    if allocation_state.loaded or (_allocation_load and not _allocation_load.done()):
+        return
+
+    def load():
+        session = SessionLocal()
+        try:
+            ensure_allocation_state(session, time_limit=DEFAULT_TIME_LIMIT)
+        finally:
+            session.close()
+
+    _allocation_load = asyncio.ensure_future(run_in_threadpool(load))
+
+
+def reload_allocation_state(db: Session):
+    """Cold-solves the live recommendations from a fresh snapshot, e.g. after a bulk change."""
+    allocation_state.load(*query_snapshot(db))
+    return allocation_state
+
+
+def adopt_allocation(db: Session, version: int, patients: list, beds: list, assignments: dict):
+    """
+    Installs an optimal full solve of a snapshot taken at allocation_state
+    `version` as the live recommendations. If deltas arrived while it ran,
+    the snapshot is stale: the solve only seeds a fresh snapshot, whose
+    pairs that are still valid are kept, and polish() restores optimality.
+    """
+    if allocation_state.load(patients, beds, assignments, expected_version=version):
+        return allocation_state
+    with allocation_state.lock:
+        # Deltas are idempotent, so one that is already in this snapshot and
+        # waiting on the lock is harmless when it applies afterwards
+        allocation_state.load(*query_snapshot(db), assignments=assignments)
+        allocation_state.polish()
+    return allocation_state
+
+
+def apply_assignments(db: Session, assignments: dict, all_or_nothing: bool = False):
+    """
+    Applies a whole {patient_id: bed_id} set in one transaction with set-based
+    compare-and-set UPDATEs: a bed is only taken if it is still Available and
+    a patient only moves if still In Queue. Pairs that lose a race are rolled
+    back individually and reported. Returns (applied, conflicts).
+    """
+    conflicts = []
+    requested = {}
+    seen_beds = set()
+    for pid, bed_id in assignments.items():
+        if bed_id in seen_beds:
+            conflicts.append({"patient_id": pid, "bed_id": bed_id, "reason": "duplicate_bed"})
+            continue
+        seen_beds.add(bed_id)
+        requested[pid] = bed_id
+
+    applied = {}
+    if requested:
+        bed_to_patient = {bed_id: pid for pid, bed_id in requested.items()}
+
+        # 1. Take every bed that is still Available
+        won_beds = set(db.execute(
+            update(Bed)
+            .where(Bed.id.in_(bed_to_patient), Bed.status == "Available")
+            .values(status="Occupied", patient_id=case(bed_to_patient, value=Bed.id))
+            .returning(Bed.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        # 2. Move the matching patients out of the queue if they are still in it
+        candidates = [bed_to_patient[b] for b in won_beds]
+        won_patients = set(db.execute(
+            update(Patient)
+            .where(Patient.id.in_(candidates), Patient.status == "In Queue")
+            .values(status="Assigned")
+            .returning(Patient.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()) if candidates else set()
+
+        # 3. Give back beds whose patient was no longer waiting
+        orphaned = [requested[pid] for pid in candidates if pid not in won_patients]
+        if orphaned:
+            db.execute(
+                update(Bed)
+                .where(Bed.id.in_(orphaned))
+                .values(status="Available", patient_id=None)
+                .execution_options(synchronize_session=False)
+            )
+
+        applied = {pid: requested[pid] for pid in won_patients}
+        failed = {pid: bed_id for pid, bed_id in requested.items() if pid not in applied}
+        if failed:
+            bed_rows = dict(db.execute(select(Bed.id, Bed.status).where(Bed.id.in_(failed.values()))).all())
+            patient_rows = dict(db.execute(select(Patient.id, Patient.status).where(Patient.id.in_(failed))).all())
+            for pid, bed_id in failed.items():
+                if pid not in patient_rows:
+                    reason = "patient_not_found"
+                elif bed_id not in bed_rows:
+                    reason = "bed_not_found"
+                elif bed_id not in won_beds:
+                    reason = "bed_unavailable"
+                else:
+                    reason = "patient_not_in_queue"
+                conflicts.append({"patient_id": pid, "bed_id": bed_id, "reason": reason})
+
+    if conflicts and all_or_nothing:
+        db.rollback()
+        return {}, conflicts
+
+    db.commit()
+    for pid, bed_id in applied.items():
+        allocation_state.remove_patient(pid)
+        triage_queue.remove(pid)
+        sync_bed(bed_id, "Occupied", pid)
+    return applied, conflicts
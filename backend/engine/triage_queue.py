@@ -0,0 +1,116 @@
+import bisect
+import datetime
+import threading
+
+from .milp_allocator import WAIT_WEIGHT
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _minutes(ts: datetime.datetime) -> float:
+    return (ts - _EPOCH).total_seconds() / 60
+
+
+def wait_minutes(admission_time: datetime.datetime, now: datetime.datetime = None) -> int:
+    if admission_time is None:
+        return 0
+    now = now or datetime.datetime.utcnow()
+    return max(0, int((now - admission_time).total_seconds() // 60))
+
+
+class TriageQueue:
+    """
+    Waiting patients ordered by priority = acuity_score + WAIT_WEIGHT *
+    minutes waited, the same wait bonus the allocator scores with. Every
+    patient's wait grows at the same rate, so the order never changes with
+    time: each patient gets a fixed key (acuity - WAIT_WEIGHT * admission
+    minutes) and the queue is a sorted list kept up to date by intake,
+    assignment and discharge. Top-K and keyset pages are slices of it.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._order = []      # sorted (key, patient_id); smallest key = highest priority
+        self._entries = {}    # patient_id -> (key, patient dict)
+        self._admitted_sum = 0.0
+
+    @staticmethod
+    def _key(patient: dict):
+        admitted = patient.get("admission_time") or datetime.datetime.utcnow()
+        return -(patient["acuity_score"] - WAIT_WEIGHT * _minutes(admitted))
+
+    def load(self, patients: list):
+        """patients: dicts with at least id, acuity_score and admission_time."""
+        with self.lock:
+            self._reset()
+            for p in patients:
+                self._entries[p["id"]] = (self._key(p), p)
+                self._admitted_sum += _minutes(p.get("admission_time") or datetime.datetime.utcnow())
+            self._order = sorted((key, pid) for pid, (key, _) in self._entries.items())
+            self.loaded = True
+
+    def add(self, patient: dict):
+        with self.lock:
+            if not self.loaded:
+                return
+            self.remove(patient["id"])
+            key = self._key(patient)
+            self._entries[patient["id"]] = (key, patient)
+            self._admitted_sum += _minutes(patient.get("admission_time") or datetime.datetime.utcnow())
+            bisect.insort(self._order, (key, patient["id"]))
+
+    def remove(self, patient_id: str):
+        with self.lock:
+            entry = self._entries.pop(patient_id, None)
+            if entry is None:
+                return
+            key, patient = entry
+            self._admitted_sum -= _minutes(patient.get("admission_time") or datetime.datetime.utcnow())
+            i = bisect.bisect_left(self._order, (key, patient_id))
+            if i < len(self._order) and self._order[i] == (key, patient_id):
+                del self._order[i]
+
+    def __len__(self):
+        return len(self._order)
+
+    def page(self, limit: int = None, after: str = None):
+        """
+        Patients in priority order, starting after the `after` cursor.
+        Returns (patients, next_cursor); each patient dict gets its current
+        wait_time_mins and priority. next_cursor is None on the last page.
+        """
+        now = datetime.datetime.utcnow()
+        with self.lock:
+            start = 0
+            if after:
+                key, _, pid = after.partition("|")
+                start = bisect.bisect_right(self._order, (float(key), pid))
+            end = len(self._order) if limit is None else min(len(self._order), start + limit)
+            rows = self._order[start:end]
+            more = end < len(self._order)
+            result = []
+            for key, pid in rows:
+                patient = dict(self._entries[pid][1])
+                wait = wait_minutes(patient.get("admission_time"), now)
+                patient["wait_time_mins"] = wait
+                patient["priority"] = round(patient["acuity_score"] + WAIT_WEIGHT * wait, 1)
+                result.append(patient)
+            next_cursor = f"{rows[-1][0]!r}|{rows[-1][1]}" if more and rows else None
+            return result, next_cursor
+
+    def top(self, k: int) -> list:
+        return self.page(limit=k)[0]
+
+    def average_wait_mins(self) -> float:
+        with self.lock:
+            if not self._entries:
+                return 0.0
+            now = _minutes(datetime.datetime.utcnow())
+            return max(0.0, now - self._admitted_sum / len(self._entries))
+
+
+triage_queue = TriageQueue()
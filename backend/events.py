@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Events published within this window are coalesced and delivered together
+EVENT_BATCH_MS = float(os.getenv("EVENT_BATCH_MS", "100"))
+
+BED_STATUS_CHANGED = "BED_STATUS_CHANGED"
+PATIENT_QUEUED = "PATIENT_QUEUED"
+PATIENT_ASSIGNED = "PATIENT_ASSIGNED"
+PATIENT_DISCHARGED = "PATIENT_DISCHARGED"
+
+
+def ward_topic(ward_id: str) -> str:
+    return f"ward:{ward_id}"
+
+
+class EventBus:
+    """
+    In-process topic bus. Write paths publish after their commit from any
+    thread; events are coalesced per (topic, key) so only the latest state
+    of a bed or patient survives, and every `window` the pending batch is
+    handed to the subscribers on the event loop. Subscribers are plain
+    callables taking (topic, events) and must not block.
+    """
+
+    def __init__(self, window_ms: float = EVENT_BATCH_MS):
+        self.window = window_ms / 1000
+        self._subscribers = {}  # topic ("*" = all) -> list of callbacks
+        self._pending = {}      # topic -> OrderedDict key -> event
+        self._lock = threading.Lock()
+        self._loop = None
+        self._flush_scheduled = False
+        self.published = 0
+        self.delivered = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Events are delivered on this loop; until one is bound, publishing is a no-op."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = loop
+                self._pending.clear()
+                self._flush_scheduled = False
+
+    def subscribe(self, topic: str, callback):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, topic: str, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, event_type: str, payload: dict, topics: list, key=None):
+        event = {"type": event_type, "ts": time.time(), **payload}
+        with self._lock:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return
+            self.published += 1
+            for topic in topics:
+                pending = self._pending.setdefault(topic, OrderedDict())
+                k = key if key is not None else (event_type, self.published)
+                pending.pop(k, None)
+                pending[k] = event
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        loop.call_soon_threadsafe(loop.call_later, self.window, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+            wildcard = list(self._subscribers.get("*", []))
+            targets = {topic: list(self._subscribers.get(topic, [])) + wildcard for topic in pending}
+        for topic, events in pending.items():
+            batch = list(events.values())
+            for callback in targets[topic]:
+                try:
+                    callback(topic, batch)
+                    self.delivered += len(batch)
+                except Exception:
+                    pass  # a broken subscriber must not stop the others
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "published": self.published,
+                "delivered": self.delivered,
+                "topics": sorted(t for t, cbs in self._subscribers.items() if cbs),
+                "window_ms": self.window * 1000,
+            }
+
+
+event_bus = EventBus()
+
+
+# ---- typed events ----
+
+def bed_status_changed(bed: dict):
+    event_bus.publish(BED_STATUS_CHANGED, {
+        "bed_id": bed["id"], "ward_id": bed["ward_id"], "bed_type": bed["bed_type"],
+        "status": bed["status"], "patient_id": bed.get("patient_id"),
+    }, ["beds", ward_topic(bed["ward_id"])], key=("bed", bed["id"]))
+
+
+def patient_queued(patient: dict):
+    event_bus.publish(PATIENT_QUEUED, {
+        "patient_id": patient["id"], "triage_level": patient["triage_level"],
+        "acuity_score": patient["acuity_score"],
+    }, ["queue"], key=("patient", patient["id"]))
+
+
+def patient_assigned(patient_id: str, bed_id: str, ward_id: str = None):
+    topics = ["queue"] + ([ward_topic(ward_id)] if ward_id else [])
+    event_bus.publish(PATIENT_ASSIGNED, {"patient_id": patient_id, "bed_id": bed_id, "ward_id": ward_id},
+                      topics, key=("patient", patient_id))
+
+
+def patient_discharged(patient_id: str, bed_id: str = None, ward_id: str = None, was_queued: bool = False):
+    topics = (["queue"] if was_queued else []) + ([ward_topic(ward_id)] if ward_id else [])
+    event_bus.publish(PATIENT_DISCHARGED, {"patient_id": patient_id, "bed_id": bed_id, "ward_id": ward_id},
+                      topics or ["queue"], key=("patient", patient_id))
@@ -1,10 +1,17 @@
+import os
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from .database import engine, Base, SessionLocal, ensure_indexes
 from .routers import dashboard, wards, patients, simulator, allocation, forecast, auth, websocket
+from .engine.jobs import job_queue
+from .engine.state import ensure_bed_index
+from .engine.forecaster import get_forecaster, multi_forecaster
+from .engine import backtest
 
-# Create tables
+# Create tables (and any indexes added since they were created)
 Base.metadata.create_all(bind=engine)
+ensure_indexes()
 
 app = FastAPI(title="SmartBed AI API")
 
@@ -25,6 +32,29 @@ app.include_router(allocation.router)
 app.include_router(forecast.router)
 app.include_router(websocket.router)
 
+@app.on_event("startup")
+def warm_forecaster():
+    # Load (or fit) the forecast model off the request path so /health is
+    # served immediately and the first /api/forecast does not pay for it
+    if os.getenv("FORECASTER_WARMUP", "1") == "1":
+        threading.Thread(target=get_forecaster, name="forecaster-warmup", daemon=True).start()
+
+@app.on_event("startup")
+def load_bed_index():
+    # Bed reads (beds, wards, KPIs, allocation) are served from memory
+    db = SessionLocal()
+    try:
+        ensure_bed_index(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def shutdown_job_pool():
+    websocket.kpi_publisher.stop()
+    job_queue.shutdown()
+    multi_forecaster.shutdown()
+    backtest.shutdown_pool()
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 import datetime
 
@@ -39,6 +39,13 @@ class Patient(Base):
     # Relational reference -- bed will have the FK
     assigned_bed = relationship("Bed", back_populates="patient", uselist=False)
 
+    __table_args__ = (
+        # Triage queue: status filter ordered by acuity
+        Index("ix_patients_status_acuity", "status", "acuity_score"),
+        # Daily admission counts for the forecaster
+        Index("ix_patients_admission_time", "admission_time"),
+    )
+
 class Bed(Base):
     __tablename__ = "beds"
 
@@ -53,6 +60,13 @@ class Bed(Base):
     ward = relationship("Ward", back_populates="beds")
     patient = relationship("Patient", back_populates="assigned_bed", uselist=False)
 
+    __table_args__ = (
+        # Available beds by type (allocation), per-ward occupancy, bed of a patient
+        Index("ix_beds_status_type", "status", "bed_type"),
+        Index("ix_beds_ward_status", "ward_id", "status"),
+        Index("ix_beds_patient_id", "patient_id"),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
 
@@ -62,3 +76,8 @@ class Alert(Base):
     severity = Column(String) # info, warning, critical
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     is_active = Column(Boolean, default=True)
+
+    __table_args__ = (
+        # Active alerts, newest first
+        Index("ix_alerts_active_timestamp", "is_active", "timestamp"),
+    )
@@ -1,32 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..models import Patient, Bed
-from ..engine.milp_allocator import run_allocation
+from ..engine.solvers import BACKENDS
+from ..engine.jobs import job_queue, QueueFullError
+from ..engine.incremental import allocation_state
+from ..engine.state import adopt_allocation, apply_assignments, ensure_allocation_state, query_snapshot
+from .websocket import manager
 
 router = APIRouter(prefix="/api/allocation", tags=["allocation"])
 
-@router.post("/optimize")
-def optimize_allocation(db: Session = Depends(get_db)):
-    # 1. Gather all queue patients
-    db_patients = db.query(Patient).filter(Patient.status == "In Queue").all()
-    patients = [{"id": p.id, "triage_level": p.triage_level, "acuity_score": p.acuity_score, "wait_time_mins": 15} for p in db_patients]
-    
-    # 2. Gather all available beds
-    db_beds = db.query(Bed).filter(Bed.status == "Available").all()
-    beds = [{"id": b.id, "ward_id": b.ward_id, "bed_type": b.bed_type} for b in db_beds]
-    
+
+class CommitRequest(BaseModel):
+    assignments: Dict[str, str]  # patient_id -> bed_id
+    all_or_nothing: bool = False
+
+
+def _load_snapshot(db: Session):
+    patients, beds = query_snapshot(db)
     if not patients:
         raise HTTPException(status_code=400, detail="No patients in queue")
     if not beds:
         raise HTTPException(status_code=400, detail="No available beds")
-        
-    # 3. Run MILP Assigner
-    assignments, obj_val = run_allocation(patients, beds)
-    
+    return patients, beds
+
+
+def _submit(patients: list, beds: list, engine: str, time_limit: Optional[float], decompose: bool):
+    if engine != "auto" and engine not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown solver engine '{engine}'. Choose one of: auto, {', '.join(BACKENDS)}")
+    try:
+        return job_queue.submit(patients, beds, engine=engine, time_limit=time_limit, decompose=decompose)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _job_response(job: dict):
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "engine": job["result"]["engine"] if job["result"] else job["engine"],
+        "time_limit": job["time_limit"],
+        "decompose": job["decompose"],
+        "joined": job["joined"],
+        "submitted_at": job["submitted_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+
+async def _push_job_done(job: dict):
+    await manager.broadcast({"type": "ALLOCATION_JOB_DONE", "payload": _job_response(job)})
+
+job_queue.add_listener(_push_job_done)
+
+
+@router.post("/optimize")
+async def optimize_allocation(engine: str = "auto", time_limit: Optional[float] = Query(None, gt=0), decompose: bool = False,
+                              commit: bool = False, db: Session = Depends(get_db)):
+    version = allocation_state.version
+    patients, beds = await run_in_threadpool(_load_snapshot, db)
+
+    # 3. Run the assignment engine on the job pool and wait for it without
+    # holding a worker thread ("auto" prefers the in-process exact solver)
+    job = _submit(patients, beds, engine, time_limit, decompose)
+    job = await job_queue.wait(job["id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=400, detail=job["error"])
+
+    result = job["result"]
+    assignments = result["assignments"]
+
+    # Re-sync live recommendations with the fresh full solve. A time-limited
+    # incumbent is not optimal, and repairs assume they start from an optimum.
+    # Deltas that landed while the job ran are kept, not overwritten.
+    if result["optimal"]:
+        await run_in_threadpool(adopt_allocation, db, version, patients, beds, assignments)
+
+    # Optionally apply the whole set right away in one transaction
+    committed = None
+    if commit:
+        applied, conflicts = await run_in_threadpool(apply_assignments, db, assignments)
+        committed = {"applied": applied, "conflicts": conflicts}
+
     return {
         "status": "success",
         "assignments": assignments,
-        "objective_value": obj_val,
+        "objective_value": result["objective_value"],
+        "engine": result["engine"],
+        "optimal": result["optimal"],
+        "gap": result["gap"],
+        "job_id": job["id"],
+        "components": result.get("components"),
+        "parts": result.get("parts"),
+        "committed": committed,
         "metrics": {"wait_time_reduction_mins": len(assignments) * 2, "survival_prob_increase": len(assignments) * 1.5}
     }
+
+
+@router.post("/commit")
+def commit_allocation(payload: CommitRequest, db: Session = Depends(get_db)):
+    """Applies a whole optimizer assignment set atomically instead of one /assign call per patient."""
+    applied, conflicts = apply_assignments(db, payload.assignments, payload.all_or_nothing)
+    if conflicts and payload.all_or_nothing:
+        raise HTTPException(status_code=409, detail={"message": "Assignment set conflicts with current state", "conflicts": conflicts})
+    return {
+        "status": "success" if not conflicts else "partial",
+        "applied": applied,
+        "conflicts": conflicts,
+    }
+
+
+@router.post("/jobs")
+async def submit_allocation_job(engine: str = "auto", time_limit: Optional[float] = Query(None, gt=0), decompose: bool = False,
+                                db: Session = Depends(get_db)):
+    """Queues an allocation and returns immediately. Poll GET /jobs/{id} or listen for ALLOCATION_JOB_DONE on the WebSocket."""
+    patients, beds = await run_in_threadpool(_load_snapshot, db)
+    job = _submit(patients, beds, engine, time_limit, decompose)
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}")
+def get_allocation_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@router.get("/state")
+def get_allocation_state(db: Session = Depends(get_db)):
+    """Live recommendations kept up to date incrementally as patients and beds change."""
+    state = ensure_allocation_state(db)
+    return {
+        "assignments": state.assignments(),
+        "objective_value": round(state.objective, 2),
+        "shadow_prices": state.shadow_prices(),
+    }
@@ -1,18 +1,149 @@
-from fastapi import APIRouter
-from ..engine.forecaster import forecaster_instance
+import datetime
+import hashlib
+import json
+import threading
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from ..cache import TTLCache
+from ..database import get_db
+from ..engine.forecaster import get_forecaster, multi_forecaster, share_series
+from ..engine.state import ensure_bed_index
+from ..engine.backtest import backtest
 
 router = APIRouter(prefix="/api/forecast", tags=["forecast"])
 
+# Forecasts only change when the model is refit or the date rolls over, so
+# results are cached per (model fingerprint, horizon, confidence, date).
+forecast_cache = TTLCache(maxsize=64, ttl=3600)
+not_modified_count = 0
+# Backtest reports per (data fingerprint, parameters); runs are serialized so
+# concurrent requests queue behind one pool instead of each fitting its own
+backtest_cache = TTLCache(maxsize=32, ttl=6 * 3600)
+_backtest_lock = threading.Lock()
+
+
+def _series_groups(db: Session, ward_id: Optional[str], bed_type: Optional[str], group_by: Optional[str]):
+    """
+    Series to forecast as key -> (labels, bed share), from the bed index's
+    (ward, bed_type) counts. Cheap enough to run before the cache check.
+    """
+    index = ensure_bed_index(db)
+    counts = index.counts_by("ward", "bed_type")
+    total = sum(counts.values())
+    if total == 0:
+        return {}
+
+    def ward_name(w):
+        ward = index.ward(w) if w else None
+        return ward["name"] if ward else None
+
+    groups = {}
+    for (w, t), c in counts.items():
+        if (ward_id and w != ward_id) or (bed_type and t != bed_type):
+            continue
+        if group_by == "ward":
+            labels = {"ward_id": w, "ward_name": ward_name(w), "bed_type": bed_type}
+        elif group_by == "bed_type":
+            labels = {"ward_id": ward_id, "ward_name": ward_name(ward_id), "bed_type": t}
+        else:
+            labels = {"ward_id": ward_id, "ward_name": ward_name(ward_id), "bed_type": bed_type}
+        key = f"{labels['ward_id'] or '*'}|{labels['bed_type'] or '*'}"
+        entry = groups.setdefault(key, [labels, 0])
+        entry[1] += c
+    return {key: (labels, beds / total) for key, (labels, beds) in sorted(groups.items())}
+
+
+def _cached_response(request: Request, key: tuple, build):
+    global not_modified_count
+    etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+    if request.headers.get("if-none-match") == etag:
+        not_modified_count += 1
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = forecast_cache.get(key)
+    if body is None:
+        body = json.dumps(build()).encode()
+        forecast_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
 @router.get("")
-def get_forecast():
-    # Use real ARIMA model output
-    forecast_data = forecaster_instance.forecast(days=7)
-    
-    return {
-        "metrics": {
-            "rmse": forecaster_instance.rmse,
-            "mae": forecaster_instance.mae,
-            "model_type": "Hybrid LSTM-XGBoost + ARIMA" # Keeping the PRD name for hackathon flair, using ARIMA under the hood
-        },
-        "data": forecast_data
-    }
+def get_forecast(
+    request: Request,
+    days: int = Query(7, ge=1, le=90),
+    confidence: float = Query(0.95, gt=0, lt=1),
+    ward_id: Optional[str] = None,
+    bed_type: Optional[str] = None,
+    group_by: Optional[str] = Query(None, pattern="^(ward|bed_type)$"),
+    db: Session = Depends(get_db),
+):
+    today = datetime.date.today().isoformat()
+
+    if not (ward_id or bed_type or group_by):
+        forecaster_instance = get_forecaster()
+
+        def build():
+            # Use real ARIMA model output
+            return {
+                "metrics": {
+                    "rmse": forecaster_instance.rmse,
+                    "mae": forecaster_instance.mae,
+                    "model_type": "Hybrid LSTM-XGBoost + ARIMA", # Keeping the PRD name for hackathon flair, using ARIMA under the hood
+                    "data_source": forecaster_instance.source,
+                },
+                "data": forecaster_instance.forecast(days=days, confidence=confidence)
+            }
+
+        return _cached_response(request, (forecaster_instance.fingerprint, days, confidence, today), build)
+
+    # Per-ward / per-bed-type series, fitted in parallel and returned in one batch
+    groups = _series_groups(db, ward_id, bed_type, group_by)
+    if not groups:
+        raise HTTPException(status_code=404, detail="No beds match the requested ward / bed type")
+    base = get_forecaster()
+    # Series are the hospital-wide history split by bed share
+    data_source = f"{base.source}_bed_share"
+    shares = tuple((k, round(share, 6)) for k, (_, share) in groups.items())
+
+    def build():
+        series = {k: share_series(base, share) for k, (_, share) in groups.items()}
+        results = multi_forecaster.forecast(series, days, confidence)
+        return {
+            "group_by": group_by,
+            "data_source": data_source,
+            "series": [{**groups[k][0], "data_source": data_source, **results[k]} for k in series],
+        }
+
+    return _cached_response(request, (base.fingerprint, shares, days, confidence, today, ward_id, bed_type, group_by), build)
+
+
+@router.get("/backtest")
+def get_forecast_backtest(
+    request: Request,
+    horizon: int = Query(7, ge=1, le=30),
+    folds: int = Query(8, ge=1, le=30),
+    step: int = Query(1, ge=1, le=30),
+    max_mae: Optional[float] = Query(None, gt=0),
+):
+    """Out-of-sample accuracy and latency of the candidate models on the admission history."""
+    forecaster_instance = get_forecaster()
+    key = ("backtest", forecaster_instance.fingerprint, horizon, folds, step, max_mae)
+
+    def build():
+        with _backtest_lock:
+            report = backtest_cache.get(key)
+            if report is None:
+                try:
+                    report = backtest(forecaster_instance.history_values, horizon=horizon, folds=folds, step=step, max_mae=max_mae)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                backtest_cache.set(key, report)
+            return report
+
+    return _cached_response(request, key, build)
+
+
+@router.get("/cache")
+def get_forecast_cache_stats():
+    return {**forecast_cache.stats(), "not_modified": not_modified_count}
@@ -1,15 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+import codecs
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import uuid
 from datetime import datetime
 
-from ..database import get_db
+from ..database import get_db, get_async_db, SessionLocal
 from ..models import Patient, Bed
+from ..engine.incremental import allocation_state
+from ..engine.triage_queue import triage_queue
+from ..engine.state import (
+    apply_assignments, ensure_bed_index, ensure_triage_queue_async, patient_payload, queue_entry,
+    reload_allocation_state, start_allocation_state_load, sync_bed, wards_cache,
+)
+from .allocation import CommitRequest, commit_allocation
+from ..events import patient_queued, patient_discharged
 
 router = APIRouter(prefix="/api/patients", tags=["patients"])
 
+# Bulk intake: rows per executemany transaction, and records per request
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_RECORDS = int(os.getenv("BULK_MAX_RECORDS", "20000"))
+
+
+def new_patient_id() -> str:
+    return f"P-{uuid.uuid4().hex[:10].upper()}"
+
 class AssignRequest(BaseModel):
     bed_id: str
 
@@ -20,52 +43,82 @@ class CreatePatientRequest(BaseModel):
     triage_level: str  # Red, Yellow, Green
     acuity_score: int
 
+MAX_QUEUE_PAGE = 1000
+
+
 @router.get("/queue")
-def get_patient_queue(db: Session = Depends(get_db)):
-    patients = db.query(Patient).filter(Patient.status == "In Queue").order_by(Patient.acuity_score.desc()).all()
-    
-    result = []
-    for p in patients:
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "age": p.age,
-            "condition": p.condition,
-            "triage_level": p.triage_level,
-            "acuity_score": p.acuity_score,
-            "wait_time": "14m", # Mock calculate based on admission time
-            "recommended_bed": "Pending..." # To be filled by MILP
-        })
-    return result
+async def get_patient_queue(response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_QUEUE_PAGE),
+                            after: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    Waiting patients by priority (acuity plus the allocator's wait bonus),
+    served from the in-memory triage queue. `limit` gives the top K; pass
+    the X-Next-Cursor header back as `after` for the next page.
+    Recommendations read "Pending..." until the live allocation has loaded.
+    """
+    queue = await ensure_triage_queue_async(db)
+    start_allocation_state_load()
+    loaded = allocation_state.loaded
+    try:
+        patients, next_cursor = queue.page(limit=limit, after=after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [
+        {
+            "id": p["id"],
+            "name": p["name"],
+            "age": p["age"],
+            "condition": p["condition"],
+            "triage_level": p["triage_level"],
+            "acuity_score": p["acuity_score"],
+            "wait_time": f"{p['wait_time_mins']}m",
+            "wait_time_mins": p["wait_time_mins"],
+            "priority": p["priority"],
+            "recommended_bed": (loaded and allocation_state.recommendation(p["id"])) or "Pending..."
+        }
+        for p in patients
+    ]
+
+# HTTP status for each apply_assignments conflict reason
+CONFLICT_STATUS = {
+    "patient_not_found": 404,
+    "bed_not_found": 404,
+    "bed_unavailable": 409,
+    "patient_not_in_queue": 409,
+    "duplicate_bed": 409,
+}
+CONFLICT_DETAIL = {
+    "patient_not_found": "Patient not found",
+    "bed_not_found": "Bed not found",
+    "bed_unavailable": "Bed is no longer available",
+    "patient_not_in_queue": "Patient is no longer in the queue",
+    "duplicate_bed": "Bed requested twice",
+}
 
 @router.post("/{patient_id}/assign")
 def assign_patient(patient_id: str, payload: AssignRequest, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-        
-    bed = db.query(Bed).filter(Bed.id == payload.bed_id).first()
-    if not bed:
-        raise HTTPException(status_code=404, detail="Bed not found")
-        
-    if bed.status == "Occupied" and bed.patient:
-        raise HTTPException(status_code=400, detail="Bed is already occupied")
-        
-    # Update Bed
-    bed.status = "Occupied"
-    bed.patient_id = patient.id
-    
-    # Update Patient
-    patient.status = "Assigned"
-    
-    db.commit()
-    
-    return {"status": "success", "patient_id": patient_id, "bed_id": bed.id}
+    # One compare-and-set UPDATE per table: the bed is only taken if still
+    # Available and the patient only moves if still In Queue, so concurrent
+    # nurses racing for the same bed get a 409 instead of both succeeding
+    applied, conflicts = apply_assignments(db, {patient_id: payload.bed_id}, all_or_nothing=True)
+    if conflicts:
+        reason = conflicts[0]["reason"]
+        raise HTTPException(status_code=CONFLICT_STATUS[reason],
+                            detail={"message": CONFLICT_DETAIL[reason], **conflicts[0]})
+
+    return {"status": "success", "patient_id": patient_id, "bed_id": payload.bed_id}
+
+@router.post("/assign")
+def assign_patients(payload: CommitRequest, db: Session = Depends(get_db)):
+    """Batch form: many patient -> bed pairs in one transaction, with a per-pair conflict list."""
+    return commit_allocation(payload, db)
 
 @router.post("")
 def create_patient(payload: CreatePatientRequest, db: Session = Depends(get_db)):
     # Generate unique patient ID
-    patient_id = f"P-{uuid.uuid4().hex[:6].upper()}"
+    patient_id = new_patient_id()
     
     new_patient = Patient(
         id=patient_id,
@@ -82,6 +135,11 @@ def create_patient(payload: CreatePatientRequest, db: Session = Depends(get_db))
     db.add(new_patient)
     db.commit()
     db.refresh(new_patient)
+    wards_cache.invalidate()
+
+    triage_queue.add(queue_entry(new_patient))
+    allocation_state.add_patient(patient_payload(new_patient))
+    patient_queued(patient_payload(new_patient))
     
     return {
         "id": new_patient.id,
@@ -93,3 +151,170 @@ def create_patient(payload: CreatePatientRequest, db: Session = Depends(get_db))
         "status": new_patient.status,
         "wait_time": new_patient.wait_time
     }
+
+@router.post("/{patient_id}/discharge")
+def discharge_patient(patient_id: str, db: Session = Depends(get_db)):
+    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if patient.status == "Discharged":
+        raise HTTPException(status_code=400, detail="Patient is already discharged")
+    ensure_bed_index(db)
+
+    # The freed bed goes to housekeeping before it is Available again
+    bed = db.query(Bed).filter(Bed.patient_id == patient.id).first()
+    if bed:
+        bed.status = "Cleaning"
+        bed.patient_id = None
+    was_queued = patient.status == "In Queue"
+    patient.status = "Discharged"
+    db.commit()
+
+    allocation_state.remove_patient(patient.id)
+    triage_queue.remove(patient.id)
+    if bed:
+        sync_bed(bed.id, "Cleaning")
+    else:
+        wards_cache.invalidate()
+    patient_discharged(patient.id, bed.id if bed else None, bed.ward_id if bed else None, was_queued)
+
+    return {"status": "success", "patient_id": patient.id, "bed_id": bed.id if bed else None}
+
+async def _ndjson_records(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _json_array_records(request: Request):
+    """
+    Yields the elements of a JSON array as they arrive, without reading the
+    whole body first. Raises ValueError for anything but a complete array
+    with exactly one comma between elements.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    # expect: "[" before the array, "value" after a comma, "value_or_end"
+    # right after "[", "comma_or_end" after an element
+    text, expect = "", "["
+    async for chunk in request.stream():
+        text += text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+            if pos >= len(text):
+                break
+            char = text[pos]
+            if expect == "[":
+                if char != "[":
+                    raise ValueError("Body must be a JSON array or NDJSON")
+                expect, pos = "value_or_end", pos + 1
+            elif char == "]" and expect in ("value_or_end", "comma_or_end"):
+                return
+            elif expect == "comma_or_end":
+                if char != ",":
+                    raise ValueError(f"Malformed JSON array: expected ',' or ']' at character {pos}")
+                expect, pos = "value", pos + 1
+            elif char in ",]":
+                raise ValueError(f"Malformed JSON array: unexpected '{char}' at character {pos}")
+            else:
+                try:
+                    record, pos = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    break  # element not complete yet
+                expect = "comma_or_end"
+                yield record
+        text = text[pos:]
+    raise ValueError("Truncated JSON array")
+
+
+@router.post("/bulk")
+async def bulk_intake(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Mass-casualty intake. Accepts NDJSON (Content-Type: application/x-ndjson)
+    or a JSON array of patient records, validates them as they stream in and
+    inserts them in executemany batches of BULK_BATCH_SIZE. Returns an id or
+    an error per record, then recomputes the live allocation once.
+    """
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonl" in content_type
+    records = _ndjson_records(request) if ndjson else _json_array_records(request)
+
+    results = []
+    batch = []
+    created = []
+
+    async def flush():
+        try:
+            await db.execute(insert(Patient), [row for _, row in batch])
+            await db.commit()
+            for index, row in batch:
+                results[index] = {"index": index, "id": row["id"]}
+            created.extend(row for _, row in batch)
+        except Exception as e:
+            await db.rollback()
+            for index, _ in batch:
+                results[index] = {"index": index, "error": f"insert failed: {e.__class__.__name__}"}
+        batch.clear()
+
+    try:
+        async for raw in records:
+            index = len(results)
+            if index >= BULK_MAX_RECORDS:
+                results.append({"index": index, "error": f"record limit of {BULK_MAX_RECORDS} reached; the rest of the stream was ignored"})
+                break
+            try:
+                record = CreatePatientRequest.model_validate(json.loads(raw) if isinstance(raw, bytes) else raw)
+            except ValidationError as e:
+                results.append({"index": index, "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+                continue
+            except ValueError as e:
+                results.append({"index": index, "error": f"invalid JSON: {e}"})
+                continue
+            results.append(None)
+            batch.append((index, {
+                "id": new_patient_id(),
+                **record.model_dump(),
+                "status": "In Queue",
+                "wait_time": 0,
+                "admission_time": datetime.utcnow(),
+            }))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush()
+    except ValueError as e:
+        if not results:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Malformed array framing; records already committed are still reported
+        results.append({"index": len(results), "error": str(e)})
+    if batch:
+        await flush()
+
+    objective = allocation_state.objective
+    if created:
+        for row in created:
+            triage_queue.add(queue_entry(row))
+        # One cold re-solve for the whole batch instead of one repair per patient
+        def recompute():
+            session = SessionLocal()
+            try:
+                return reload_allocation_state(session).objective
+            finally:
+                session.close()
+        objective = await run_in_threadpool(recompute)
+        for row in created:
+            patient_queued(row)
+
+    return {
+        "received": len(results),
+        "created": len(created),
+        "failed": len(results) - len(created),
+        "results": results,
+        "allocation_objective": round(objective, 2),
+    }
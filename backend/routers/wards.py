@@ -1,57 +1,196 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Dict, Any
+import hashlib
+import json
+from email.utils import formatdate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
 
-from ..database import get_db
-from ..models import Ward, Bed
+from ..database import get_db, get_async_db, AsyncSessionLocal
+from ..models import Ward, Bed, Patient
+from ..engine.bed_index import STATUSES
+from ..engine.state import ensure_bed_index, ensure_bed_index_async, sync_bed, wards_cache
+from ..engine.triage_queue import wait_minutes
+from ..events import patient_discharged
 
 router = APIRouter(prefix="/api", tags=["wards"])
 
+
+class BedStatusRequest(BaseModel):
+    status: str  # Available, Cleaning, Maintenance
+
+
 @router.get("/wards")
-def get_wards(db: Session = Depends(get_db)):
-    wards = db.query(Ward).all()
+async def get_wards(db: AsyncSession = Depends(get_async_db)):
+    result = wards_cache.get("wards")
+    if result is not None:
+        return result
+
+    # Bed and occupancy counts per ward straight from the bed index
+    index = await ensure_bed_index_async(db)
+    totals = index.counts_by("ward")
+    occupied = index.counts_by("ward", "status")
     result = []
-    for w in wards:
-        beds = db.query(Bed).filter(Bed.ward_id == w.id).all()
-        occupied = sum(1 for b in beds if b.status == "Occupied")
-        occupancy_rate = int((occupied / len(beds)) * 100) if beds else 0
-        
+    for w in index.ward_list():
+        bed_count = totals.get(w["id"], 0)
+        occupied_count = occupied.get((w["id"], "Occupied"), 0)
+        occupancy_rate = int((occupied_count / bed_count) * 100) if bed_count else 0
+
         result.append({
-            "id": w.id,
-            "name": w.name,
-            "capacity": w.capacity,
-            "current_occupancy": occupied,
+            "id": w["id"],
+            "name": w["name"],
+            "capacity": w["capacity"],
+            "current_occupancy": occupied_count,
             "occupancy_rate": occupancy_rate,
-            "staff_ratio": w.staff_ratio
+            "staff_ratio": w["staff_ratio"]
         })
+    wards_cache.set("wards", result)
     return result
 
+BED_FIELDS = ("id", "ward_id", "ward_name", "bed_type", "status", "patient")
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH = 500
+
+
+def _patient_info(p) -> dict:
+    return {
+        "id": p.id,
+        "name": p.name,
+        "age": p.age,
+        "condition": p.condition,
+        "triage_level": p.triage_level,
+        "acuity_score": p.acuity_score,
+        "status": p.status,
+        "wait_time": wait_minutes(p.admission_time) if p.status == "In Queue" else p.wait_time
+    }
+
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return BED_FIELDS
+    wanted = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in wanted if f not in BED_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s) {unknown}. Choose from: {', '.join(BED_FIELDS)}")
+    return wanted
+
+
+async def _export_beds(ward_id, bed_type, status, fields):
+    """NDJSON rows straight off a server-side cursor, one joined query, never a full list in memory."""
+    async with AsyncSessionLocal() as db:
+        query = (
+            select(Bed.id, Bed.ward_id, Ward.name, Bed.bed_type, Bed.status, Patient)
+            .outerjoin(Ward, Ward.id == Bed.ward_id)
+            .outerjoin(Patient, Patient.id == Bed.patient_id)
+            .order_by(Bed.id)
+        )
+        if ward_id:
+            query = query.where(Bed.ward_id == ward_id)
+        if bed_type:
+            query = query.where(Bed.bed_type == bed_type)
+        if status:
+            query = query.where(Bed.status == status)
+
+        rows = await db.stream(query.execution_options(yield_per=EXPORT_BATCH))
+        async for bid, wid, ward_name, btype, bstatus, patient in rows:
+            bed_info = {
+                "id": bid,
+                "ward_id": wid,
+                "ward_name": ward_name or "Unknown",
+                "bed_type": btype,
+                "status": bstatus,
+                "patient": _patient_info(patient) if patient else None,
+            }
+            yield json.dumps({f: bed_info[f] for f in fields}) + "\n"
+
+
 @router.get("/beds")
-def get_beds(db: Session = Depends(get_db)):
-    beds = db.query(Bed).options(joinedload(Bed.patient)).all()
+async def get_beds(
+    request: Request,
+    ward_id: Optional[str] = None,
+    bed_type: Optional[str] = None,
+    status: Optional[str] = None,
+    after: Optional[str] = Query(None, description="keyset cursor: return beds with id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="comma separated subset of the bed fields"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Bed map, optionally filtered and paginated. Pages are keyed on bed id:
+    follow the X-Next-Cursor header (also sent as a Link header) until it is
+    absent. format=ndjson streams a full export from the database instead.
+    """
+    wanted = _parse_fields(fields)
+    if format == "ndjson":
+        return StreamingResponse(_export_beds(ward_id, bed_type, status, wanted), media_type="application/x-ndjson")
+
+    index = await ensure_bed_index_async(db)
+    etag = '"beds-%s-%s"' % (index.version, hashlib.sha1(str(request.query_params).encode()).hexdigest()[:12])
+    headers = {"ETag": etag, "Last-Modified": formatdate(index.modified_at, usegmt=True), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    beds, next_after = index.page(ward_id, bed_type, status, after=after, limit=limit)
+    ward_names = {w["id"]: w["name"] for w in index.ward_list()} if "ward_name" in wanted else {}
+
+    # Only the assigned patients' details come from the database
+    patients = {}
+    if "patient" in wanted:
+        patient_ids = [b["patient_id"] for b in beds if b["patient_id"]]
+        if patient_ids:
+            rows = await db.execute(select(Patient).where(Patient.id.in_(patient_ids)))
+            patients = {p.id: p for p in rows.scalars()}
+
     result = []
     for b in beds:
         bed_info = {
-            "id": b.id,
-            "ward_id": b.ward_id,
-            "ward_name": b.ward.name if b.ward else "Unknown",
-            "bed_type": b.bed_type,
-            "status": b.status,
+            "id": b["id"],
+            "ward_id": b["ward_id"],
+            "ward_name": ward_names.get(b["ward_id"]) or "Unknown",
+            "bed_type": b["bed_type"],
+            "status": b["status"],
             "patient": None
         }
-        
+
         # Include patient details if assigned
-        if b.patient:
-            bed_info["patient"] = {
-                "id": b.patient.id,
-                "name": b.patient.name,
-                "age": b.patient.age,
-                "condition": b.patient.condition,
-                "triage_level": b.patient.triage_level,
-                "acuity_score": b.patient.acuity_score,
-                "status": b.patient.status,
-                "wait_time": b.patient.wait_time
-            }
-        
-        result.append(bed_info)
-    return result
+        patient = patients.get(b["patient_id"])
+        if patient:
+            bed_info["patient"] = _patient_info(patient)
+
+        result.append({f: bed_info[f] for f in wanted})
+
+    if next_after is not None:
+        headers["X-Next-Cursor"] = next_after
+        headers["Link"] = f'<{request.url.include_query_params(after=next_after)}>; rel="next"'
+    return JSONResponse(result, headers=headers)
+
+
+@router.post("/beds/{bed_id}/status")
+def set_bed_status(bed_id: str, payload: BedStatusRequest, db: Session = Depends(get_db)):
+    """Housekeeping status changes. Taking an occupied bed out of service discharges its patient."""
+    if payload.status not in STATUSES or payload.status == "Occupied":
+        raise HTTPException(status_code=400, detail="Status must be one of: Available, Cleaning, Maintenance (use /api/patients/{id}/assign to occupy a bed)")
+
+    bed = db.query(Bed).filter(Bed.id == bed_id).first()
+    if not bed:
+        raise HTTPException(status_code=404, detail="Bed not found")
+    ensure_bed_index(db)
+
+    discharged = None
+    if bed.patient_id:
+        patient = db.query(Patient).filter(Patient.id == bed.patient_id).first()
+        if patient:
+            patient.status = "Discharged"
+            discharged = patient.id
+        bed.patient_id = None
+    bed.status = payload.status
+    db.commit()
+
+    sync_bed(bed.id, bed.status)
+    if discharged:
+        patient_discharged(discharged, bed.id, bed.ward_id)
+    return {"status": "success", "bed_id": bed.id, "bed_status": bed.status, "discharged_patient_id": discharged}
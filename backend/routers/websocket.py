@@ -1,42 +1,230 @@
 import asyncio
+import json
+import os
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from .dashboard import get_dashboard_kpis
-from ..database import SessionLocal
+from ..database import AsyncSessionLocal
+from ..engine.bed_index import bed_index
+from ..events import event_bus
 
 router = APIRouter(tags=["websocket"])
 
+# Messages buffered per client before it counts as a slow consumer
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))
+# How often the publisher recomputes KPIs; clients only hear about changes
+KPI_INTERVAL = float(os.getenv("KPI_INTERVAL", "2"))
+
+
+class Client:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.task = None
+        self.resyncs = 0
+        self.topics = set()
+
+
 class ConnectionManager:
+    """
+    Each connection gets a bounded send queue drained by its own task, so
+    broadcast never awaits a socket and one slow consumer cannot stall the
+    others. A client whose queue overflows loses its backlog and gets a
+    fresh snapshot (see `resync`) instead.
+    """
+
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.clients: dict = {}
+        self.resync = None  # () -> message that brings a client fully up to date
 
-    async def connect(self, websocket: WebSocket):
+    @property
+    def active_connections(self) -> list:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket, snapshot: dict = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = Client(websocket)
+        self.clients[websocket] = client
+        if snapshot is not None:
+            client.queue.put_nowait(snapshot)
+        client.task = asyncio.create_task(self._sender(client))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.task:
+            client.task.cancel()
+
+    async def _sender(self, client: Client):
+        try:
+            while True:
+                message = await client.queue.get()
+                await client.websocket.send_json(message)
+        except Exception:
+            self.clients.pop(client.websocket, None)
+
+    def _enqueue(self, client: Client, message: dict):
+        try:
+            client.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.resyncs += 1
+            client.queue.put_nowait(self.resync() if self.resync else message)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections.copy():
+        for client in list(self.clients.values()):
+            self._enqueue(client, message)
+
+    def publish(self, topic: str, message: dict):
+        """Sends to the clients subscribed to `topic`. Runs on the event loop."""
+        for client in list(self.clients.values()):
+            if topic in client.topics:
+                self._enqueue(client, message)
+
+
+manager = ConnectionManager()
+# Topic subscribers of /ws/events; an overflowing client is told to refetch
+events_manager = ConnectionManager()
+events_manager.resync = lambda: {"type": "RESYNC"}
+event_bus.subscribe("*", lambda topic, events: events_manager.publish(
+    topic, {"type": "EVENTS", "topic": topic, "events": events}))
+
+
+async def _compute_kpis() -> dict:
+    async with AsyncSessionLocal() as db:
+        return await get_dashboard_kpis(db)
+
+
+class KpiPublisher:
+    """
+    One task per process computes the KPIs while anyone is connected, every
+    KPI_INTERVAL seconds or as soon as the event bus reports a bed / queue
+    change, and broadcasts only the fields that changed (KPI_DELTA). New and
+    resynced clients get the full UPDATE_KPI snapshot.
+    """
+
+    def __init__(self, interval: float = KPI_INTERVAL):
+        self.interval = interval
+        self.latest = None
+        self.seq = 0
+        self._task = None
+        self._wake = None
+
+    def snapshot_message(self) -> dict:
+        return {"type": "UPDATE_KPI", "payload": self.latest, "seq": self.seq}
+
+    async def snapshot(self) -> dict:
+        if self.latest is None:
+            self.latest = await _compute_kpis()
+        return self.snapshot_message()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            # Bed and queue events wake the publisher early, so changes are
+            # pushed within the bus window instead of the next tick
+            self._wake = asyncio.Event()
+            event_bus.bind(asyncio.get_running_loop())
+            for topic in ("beds", "queue"):
+                event_bus.subscribe(topic, self._on_event)
+            self._task = asyncio.create_task(self._run())
+
+    def _on_event(self, topic, events):
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            for topic in ("beds", "queue"):
+                event_bus.unsubscribe(topic, self._on_event)
+
+    async def _run(self):
+        while True:
             try:
-                await connection.send_json(message)
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not manager.clients:
+                continue
+            try:
+                kpis = await _compute_kpis()
             except Exception:
-                self.active_connections.remove(connection)
+                continue  # e.g. the database is briefly locked; try again next tick
+            delta = {k: v for k, v in kpis.items() if self.latest is None or self.latest.get(k) != v}
+            self.latest = kpis
+            if delta:
+                self.seq += 1
+                await manager.broadcast({"type": "KPI_DELTA", "payload": delta, "seq": self.seq})
+
+
+kpi_publisher = KpiPublisher()
+manager.resync = kpi_publisher.snapshot_message
 
-manager = ConnectionManager()
 
 @router.websocket("/ws/dashboard")
 async def websocket_dashboard(websocket: WebSocket):
-    await manager.connect(websocket)
+    kpi_publisher.start()
+    await manager.connect(websocket, await kpi_publisher.snapshot())
     try:
+        # Pushes happen on the client's sender task; this only notices the disconnect
         while True:
-            # Broadcast latest KPIs every 10 seconds
-            db = SessionLocal()
-            try:
-                kpis = get_dashboard_kpis(db)
-                await manager.broadcast({"type": "UPDATE_KPI", "payload": kpis})
-            finally:
-                db.close()
-            await asyncio.sleep(10)
+            await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
+
+
+def _invalid_topics(topics) -> str:
+    """Why `topics` is not a list of known topic names, or None if it is."""
+    if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+        return "topics must be a list of strings"
+    unknown = [t for t in topics if t not in ("beds", "queue")
+               and not (t.startswith("ward:") and bed_index.ward(t[len("ward:"):]) is not None)]
+    if unknown:
+        return f"unknown topic(s) {unknown}; use beds, queue or ward:<ward_id>"
+    return None
+
+
+@router.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, topics: str = ""):
+    """
+    Topic-filtered change feed. Topics: "beds", "queue" and "ward:<ward_id>",
+    given as ?topics=a,b or changed later by sending
+    {"subscribe": [...]} / {"unsubscribe": [...]}. Events arrive batched as
+    {"type": "EVENTS", "topic", "events": [...]}; bad input gets
+    {"type": "ERROR", "detail"} and leaves the subscription unchanged.
+    """
+    event_bus.bind(asyncio.get_running_loop())
+    await events_manager.connect(websocket)
+    client = events_manager.clients[websocket]
+    try:
+        initial = [t for t in topics.split(",") if t]
+        error = _invalid_topics(initial)
+        if error:
+            events_manager._enqueue(client, {"type": "ERROR", "detail": error})
+        else:
+            client.topics.update(initial)
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                events_manager._enqueue(client, {"type": "ERROR", "detail": "message must be JSON"})
+                continue
+            if not isinstance(message, dict):
+                events_manager._enqueue(client, {"type": "ERROR", "detail": "message must be a JSON object"})
+                continue
+            subscribe, unsubscribe = message.get("subscribe", []), message.get("unsubscribe", [])
+            error = _invalid_topics(subscribe) or _invalid_topics(unsubscribe)
+            if error:
+                events_manager._enqueue(client, {"type": "ERROR", "detail": error})
+                continue
+            client.topics.update(subscribe)
+            client.topics.difference_update(unsubscribe)
+            events_manager._enqueue(client, {"type": "SUBSCRIBED", "topics": sorted(client.topics)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        events_manager.disconnect(websocket)
@@ -10,10 +10,13 @@ def hash_password(password: str) -> str:
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+def reset_schema():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
 
 def seed_data():
+    # Demo data replaces everything; importing this module no longer does
+    reset_schema()
     db = SessionLocal()
 
     # 1. Users
@@ -74,6 +77,10 @@ def seed_data():
         Patient(id="P-1041", name="Emily Davis", age=28, condition="Fractured Femur", triage_level="Yellow", acuity_score=65, status="In Queue", wait_time=0),
         Patient(id="P-1035", name="Michael Brown", age=34, condition="Mild Concussion", triage_level="Green", acuity_score=35, status="In Queue", wait_time=0),
     ]
+    # Waits are derived from admission_time, so back-date each arrival
+    now = datetime.datetime.utcnow()
+    for p in patients:
+        p.admission_time = now - datetime.timedelta(minutes=p.wait_time)
     db.add_all(patients)
     db.flush()  # Flush to ensure patients are in session
     
@@ -0,0 +1,305 @@
+"""
+Large-scale synthetic hospital generator.
+
+Builds a realistic hospital (wards, beds, the current inpatients, the
+triage queue and years of discharged admissions) for load and scale
+testing. Everything is drawn from one seed, so the same arguments give the
+same rows. Rows are generated in NumPy chunks and written with Core
+executemany inserts instead of the ORM.
+
+    python -m backend.synthetic --scale m                  # into an empty database
+    python -m backend.synthetic --scale xl --reset         # wipe hospital tables first
+    python -m backend.synthetic --wards 300 --beds 100000 --history 2000000 --end 2026-01-01
+
+Timestamps are laid out backwards from --end (default: now). Pass a fixed
+--end if you need byte-identical databases across runs. Nothing is written
+until the generator is run. Without --reset it refuses to touch a database
+that already has beds or patients. The users table is never touched.
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from .database import engine, Base, ensure_indexes
+from .models import Ward, Bed, Patient, Alert
+
+# name -> (wards, beds, historical admissions, queued patients)
+SCALES = {
+    "demo": (8, 500, 20_000, 10),
+    "s": (20, 2_000, 100_000, 100),
+    "m": (60, 10_000, 400_000, 500),
+    "l": (150, 40_000, 1_000_000, 2_000),
+    "xl": (400, 100_000, 2_000_000, 5_000),
+}
+
+# specialty -> (bed type, relative ward size)
+SPECIALTIES = {
+    "ICU": ("ICU", 0.6), "Emergency": ("General", 1.4), "Cardiology": ("Step-Down", 0.9),
+    "Neurology": ("Step-Down", 0.7), "Pediatrics": ("General", 1.0), "Oncology": ("Step-Down", 0.9),
+    "Orthopedics": ("General", 1.0), "General": ("General", 1.6), "Surgery": ("Step-Down", 1.0),
+    "Maternity": ("General", 0.8),
+}
+TRIAGE_MIX = {"Red": 0.2, "Yellow": 0.45, "Green": 0.35}
+ACUITY_RANGE = {"Red": (80, 100), "Yellow": (50, 80), "Green": (10, 50)}
+CONDITIONS = {
+    "Red": ["Cardiac Arrest", "Severe Trauma", "Sepsis", "Stroke", "Acute myocardial infarction"],
+    "Yellow": ["Respiratory Distress", "Fractured Femur", "Pneumonia", "Moderate internal bleeding", "Kidney stones"],
+    "Green": ["Mild Concussion", "Minor fracture", "Laceration", "Sprained ankle", "Migraine"],
+}
+FIRST_NAMES = ["Aarav", "Priya", "John", "Meera", "Robert", "Emily", "Arjun", "Sara", "Michael", "Ananya",
+               "David", "Fatima", "Chen", "Lucia", "Omar", "Grace", "Ravi", "Hannah", "Kenji", "Nora"]
+LAST_NAMES = ["Kumar", "Sharma", "Doe", "Nair", "Chen", "Davis", "Patel", "Smith", "Brown", "Garcia",
+              "Khan", "Tanaka", "Silva", "Novak", "Okafor", "Martin", "Ali", "Rossi", "Iyer", "Lee"]
+
+# Bed status shares besides the target occupancy
+CLEANING_RATE = 0.03
+MAINTENANCE_RATE = 0.01
+# Admissions by weekday (Mon..Sun) and hour of day
+WEEKDAY_WEIGHTS = np.array([1.15, 1.08, 1.0, 1.0, 1.05, 0.85, 0.87])
+HOUR_WEIGHTS = np.array([2, 1.5, 1.2, 1, 1, 1.2, 2, 3, 4, 4.5, 4.5, 4.2, 4, 4, 4.2, 4.5, 4.8, 5, 4.8, 4.2, 3.8, 3.2, 2.8, 2.4])
+YEARLY_GROWTH = 0.05
+# Mean minutes a queued patient has been waiting
+MEAN_QUEUE_WAIT_MINS = 45
+
+CHUNK_SIZE = 20_000
+HOSPITAL_TABLES = [Alert.__table__, Bed.__table__, Patient.__table__, Ward.__table__]
+
+
+def _bulk_insert(table, rows: list):
+    with engine.begin() as conn:
+        conn.execute(insert(table), rows)
+
+
+def reset_hospital_tables():
+    """Drops and recreates wards, beds, patients and alerts; users are kept."""
+    Base.metadata.drop_all(bind=engine, tables=HOSPITAL_TABLES)
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes()
+
+
+class HospitalGenerator:
+    def __init__(self, wards: int, beds: int, history: int, queue: int, days: int = 730,
+                 occupancy: float = 0.85, seed: int = 42, end: datetime.datetime = None):
+        if wards < 1 or beds < wards:
+            raise ValueError(f"need at least one ward and one bed per ward, got {wards} wards and {beds} beds")
+        self.n_wards, self.n_beds, self.n_history, self.n_queue = wards, beds, history, queue
+        self.days = days
+        self.occupancy = occupancy
+        self.seed = seed
+        self.end = end or datetime.datetime.utcnow().replace(microsecond=0)
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self._next_patient = 0
+        self.counts = {}
+        self.timings = {}
+
+    # ---- helpers ----
+
+    def _patient_ids(self, n: int) -> list:
+        start, self._next_patient = self._next_patient, self._next_patient + n
+        return [f"P-{i:08d}" for i in range(start, start + n)]
+
+    def _clinical(self, n: int):
+        """Triage level, acuity score, condition, name and age columns for n patients."""
+        levels = np.array(list(TRIAGE_MIX))
+        triage = self.rng.choice(levels, size=n, p=list(TRIAGE_MIX.values()))
+        acuity = np.empty(n, dtype=np.int64)
+        condition = np.empty(n, dtype=object)
+        for level in levels:
+            mask = triage == level
+            lo, hi = ACUITY_RANGE[level]
+            acuity[mask] = self.rng.integers(lo, hi, size=mask.sum())
+            condition[mask] = self.rng.choice(CONDITIONS[level], size=mask.sum())
+        first = self.rng.choice(FIRST_NAMES, size=n)
+        last = self.rng.choice(LAST_NAMES, size=n)
+        ages = np.clip(self.rng.normal(52, 20, size=n), 0, 99).astype(np.int64)
+        return triage, acuity, condition, first, last, ages
+
+    def _patients(self, admitted: list, status: str, waits=None) -> list:
+        n = len(admitted)
+        triage, acuity, condition, first, last, ages = self._clinical(n)
+        ids = self._patient_ids(n)
+        return [
+            {
+                "id": ids[i], "name": f"{first[i]} {last[i]}", "age": int(ages[i]),
+                "condition": condition[i], "triage_level": triage[i], "acuity_score": int(acuity[i]),
+                "admission_time": admitted[i], "status": status,
+                "wait_time": int(waits[i]) if waits is not None else 0,
+            }
+            for i in range(n)
+        ]
+
+    def _timed(self, name: str, rows: int, started: float):
+        self.counts[name] = self.counts.get(name, 0) + rows
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    # ---- tables ----
+
+    def wards_and_beds(self):
+        """
+        Ward sizes follow the specialty weights with noise. Every ward gets
+        one bed, the rest are split by weight with the rounding remainder
+        going to the largest fractional shares, so they add up to n_beds.
+        """
+        t = time.perf_counter()
+        names = list(SPECIALTIES)
+        specialty = [names[i % len(names)] for i in range(self.n_wards)]
+        weights = np.array([SPECIALTIES[s][1] for s in specialty]) * self.rng.uniform(0.6, 1.4, self.n_wards)
+        quota = weights / weights.sum() * (self.n_beds - self.n_wards)
+        sizes = 1 + np.floor(quota).astype(np.int64)
+        sizes[np.argsort(np.floor(quota) - quota)[:self.n_beds - sizes.sum()]] += 1
+
+        ward_rows, self.beds = [], []
+        seen = {}
+        for i, (name, size) in enumerate(zip(specialty, sizes)):
+            seen[name] = seen.get(name, 0) + 1
+            ward_id = str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+            label = name if self.n_wards <= len(names) else f"{name} {seen[name]}"
+            prefix = name[:3].upper() + ("" if self.n_wards <= len(names) else str(seen[name]))
+            ward_rows.append({"id": ward_id, "name": label, "capacity": int(size),
+                              "staff_ratio": 0.2 if name == "ICU" else 0.1})
+            bed_type = SPECIALTIES[name][0]
+            self.beds.extend((f"{prefix}-{j + 1}", ward_id, bed_type) for j in range(size))
+        _bulk_insert(Ward.__table__, ward_rows)
+        self._timed("wards", len(ward_rows), t)
+
+    def inpatients_and_beds(self):
+        """Assigns the occupied beds to current inpatients admitted in the last ten days."""
+        t = time.perf_counter()
+        n = len(self.beds)
+        draw = self.rng.random(n)
+        occupied = draw < self.occupancy
+        cleaning = (draw >= self.occupancy) & (draw < self.occupancy + CLEANING_RATE)
+        maintenance = (draw >= self.occupancy + CLEANING_RATE) & (draw < self.occupancy + CLEANING_RATE + MAINTENANCE_RATE)
+
+        n_in = int(occupied.sum())
+        minutes_ago = self.rng.integers(60, 10 * 24 * 60, size=n_in)
+        admitted = [self.end - datetime.timedelta(minutes=int(m)) for m in minutes_ago]
+        inpatients = self._patients(admitted, "Assigned", waits=self.rng.exponential(MEAN_QUEUE_WAIT_MINS, n_in))
+        for start in range(0, n_in, CHUNK_SIZE):
+            _bulk_insert(Patient.__table__, inpatients[start:start + CHUNK_SIZE])
+        self._timed("inpatients", n_in, t)
+
+        t = time.perf_counter()
+        patient_ids = iter(p["id"] for p in inpatients)
+        rows = []
+        for i, (bed_id, ward_id, bed_type) in enumerate(self.beds):
+            status = ("Occupied" if occupied[i] else "Cleaning" if cleaning[i]
+                      else "Maintenance" if maintenance[i] else "Available")
+            rows.append({"id": bed_id, "ward_id": ward_id, "bed_type": bed_type, "status": status,
+                         "patient_id": next(patient_ids) if occupied[i] else None})
+            if len(rows) >= CHUNK_SIZE:
+                _bulk_insert(Bed.__table__, rows)
+                rows = []
+        if rows:
+            _bulk_insert(Bed.__table__, rows)
+        self._timed("beds", n, t)
+
+    def queue(self):
+        t = time.perf_counter()
+        waits = self.rng.exponential(MEAN_QUEUE_WAIT_MINS, self.n_queue)
+        admitted = [self.end - datetime.timedelta(minutes=float(w)) for w in waits]
+        if self.n_queue:
+            _bulk_insert(Patient.__table__, self._patients(admitted, "In Queue"))
+        self._timed("queue", self.n_queue, t)
+
+    def history(self):
+        """
+        Discharged admissions over the last `days` days (ending yesterday),
+        with weekday and hour-of-day seasonality and steady growth, so the
+        forecaster has a realistic series to fit.
+        """
+        first_day = (self.end - datetime.timedelta(days=self.days)).date()
+        day_index = np.arange(self.days)
+        weekdays = np.array([(first_day + datetime.timedelta(days=int(d))).weekday() for d in day_index])
+        day_weights = WEEKDAY_WEIGHTS[weekdays] * (1 + YEARLY_GROWTH) ** (day_index / 365)
+        day_p = day_weights / day_weights.sum()
+        hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+        midnight = datetime.datetime.combine(first_day, datetime.time())
+
+        remaining = self.n_history
+        while remaining > 0:
+            t = time.perf_counter()
+            n = min(CHUNK_SIZE, remaining)
+            days = self.rng.choice(self.days, size=n, p=day_p)
+            seconds = self.rng.choice(24, size=n, p=hour_p) * 3600 + self.rng.integers(0, 3600, size=n)
+            admitted = [midnight + datetime.timedelta(days=int(d), seconds=int(s)) for d, s in zip(days, seconds)]
+            _bulk_insert(Patient.__table__, self._patients(admitted, "Discharged"))
+            self._timed("history", n, t)
+            remaining -= n
+
+    def run(self):
+        self.wards_and_beds()
+        self.inpatients_and_beds()
+        self.queue()
+        self.history()
+        return {
+            name: {"rows": self.counts[name], "seconds": round(self.timings[name], 2),
+                   "rows_per_s": round(self.counts[name] / self.timings[name]) if self.timings[name] else None}
+            for name in self.counts
+        }
+
+
+def generate_hospital(wards: int, beds: int, history: int, queue: int, reset: bool = False, **kwargs) -> dict:
+    """
+    Fills the configured database with a synthetic hospital. Refuses to run
+    on a database that already has beds or patients unless reset=True, which
+    drops the hospital tables first. Returns per-table row counts and timings.
+    """
+    generator = HospitalGenerator(wards, beds, history, queue, **kwargs)
+    if reset:
+        reset_hospital_tables()
+    else:
+        Base.metadata.create_all(bind=engine)
+        ensure_indexes()
+        with engine.connect() as conn:
+            existing = conn.scalar(select(func.count()).select_from(Bed)) + conn.scalar(select(func.count()).select_from(Patient))
+        if existing:
+            raise RuntimeError("Database already has beds or patients; pass reset=True (--reset) to replace them")
+    return generator.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a large synthetic hospital in the configured database")
+    parser.add_argument("--scale", choices=SCALES, default="demo", help="preset sizes; the flags below override it")
+    parser.add_argument("--wards", type=int)
+    parser.add_argument("--beds", type=int)
+    parser.add_argument("--history", type=int, help="discharged historical admissions")
+    parser.add_argument("--queue", type=int, help="patients currently waiting")
+    parser.add_argument("--days", type=int, default=730, help="days of admission history")
+    parser.add_argument("--occupancy", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat, help="ISO timestamp the data ends at (default: now)")
+    parser.add_argument("--reset", action="store_true", help="drop wards, beds, patients and alerts first")
+    args = parser.parse_args(argv)
+
+    wards, beds, history, queue = SCALES[args.scale]
+    sizes = dict(wards=args.wards or wards, beds=args.beds or beds,
+                 history=history if args.history is None else args.history,
+                 queue=queue if args.queue is None else args.queue)
+    if sizes["wards"] > sizes["beds"]:
+        parser.error("need at least one bed per ward")
+
+    print(f"Generating {sizes['wards']} wards, {sizes['beds']:,} beds, {sizes['queue']:,} queued and "
+          f"{sizes['history']:,} historical patients (seed {args.seed})")
+    try:
+        stats = generate_hospital(**sizes, reset=args.reset, days=args.days, occupancy=args.occupancy,
+                                  seed=args.seed, end=args.end)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"\n{'table':<12} {'rows':>10} {'seconds':>9} {'rows/s':>10}")
+    for name, s in stats.items():
+        print(f"{name:<12} {s['rows']:>10,} {s['seconds']:>9.2f} {s['rows_per_s'] or 0:>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import random
+
+from backend.engine.incremental import AllocationState
+from backend.engine.solvers import solve_allocation
+
+BED_TYPES = ["ICU", "Step-Down", "General"]
+
+
+def _patient(rng, i):
+    level = rng.choice(["Red", "Yellow", "Green"])
+    return {"id": f"P{i}", "triage_level": level, "acuity_score": rng.randint(1, 100),
+            "wait_time_mins": rng.randint(0, 120)}
+
+
+def test_add_bed_of_unseen_type_stays_optimal():
+    # Every bed of one type is occupied at load time, then one frees up
+    for seed in range(300):
+        rng = random.Random(seed)
+        missing = rng.choice(BED_TYPES)
+        patients = [_patient(rng, i) for i in range(rng.randint(1, 12))]
+        beds = [{"id": f"B{i}", "ward_id": "W1", "bed_type": rng.choice([t for t in BED_TYPES if t != missing])}
+                for i in range(rng.randint(1, 8))]
+        state = AllocationState()
+        state.load(patients, beds)
+        # Warm the residual-arc cache the way a removal does
+        state.remove_bed(beds[0]["id"])
+        beds = beds[1:]
+
+        for j in range(rng.randint(1, 3)):
+            bed = {"id": f"N{j}", "ward_id": "W2", "bed_type": missing}
+            state.add_bed(bed)
+            beds.append(bed)
+            expected = solve_allocation(patients, beds)["objective_value"] if beds else 0.0
+            assert abs(state.objective - expected) < 1e-6, (seed, j, state.objective, expected)
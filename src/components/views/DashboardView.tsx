@@ -61,6 +61,9 @@ export default function DashboardView({ onConnectionChange }: DashboardProps) {
         const data = JSON.parse(event.data);
         if (data.type === 'UPDATE_KPI') {
           setKpis(data.payload);
+        } else if (data.type === 'KPI_DELTA') {
+          // Only the changed fields are sent
+          setKpis((prev: any) => ({ ...prev, ...data.payload }));
         }
       } catch (e) {
         console.error("WebSocket message error", e);
@@ -102,34 +102,31 @@ export default function TriageView() {
   const acceptAllAssignments = async () => {
     if (!allocations || !allocations.assignments) return;
     
-    const assignments = Object.entries(allocations.assignments) as [string, string][];
-    let successCount = 0;
-    
-    for (const [patientId, bedId] of assignments) {
-      try {
-        const token = localStorage.getItem('smartbed_token');
-        const res = await fetch(`http://localhost:8000/api/patients/${patientId}/assign`, {
-          method: 'POST',
-          headers: {
-            'Authorization': `Bearer ${token}`,
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({ bed_id: bedId, priority_override: false })
-        });
-        if (res.ok) {
-          successCount++;
+    try {
+      // Apply the whole set in one transaction instead of one /assign call per patient
+      const token = localStorage.getItem('smartbed_token');
+      const res = await fetch('http://localhost:8000/api/allocation/commit', {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ assignments: allocations.assignments })
+      });
+      if (res.ok) {
+        const data = await res.json();
+        if (data.conflicts.length > 0) {
+          console.error('Some assignments conflicted with current bed state', data.conflicts);
+        }
+        // Refresh data after all assignments
+        await fetchData();
+        // Clear allocations panel
+        if (data.conflicts.length === 0) {
+          setAllocations(null);
         }
-      } catch (e) {
-        console.error(`Failed to assign patient ${patientId} to bed ${bedId}`, e);
       }
-    }
-    
-    // Refresh data after all assignments
-    await fetchData();
-    
-    // Clear allocations panel
-    if (successCount === assignments.length) {
-      setAllocations(null);
+    } catch (e) {
+      console.error('Failed to commit assignments', e);
     }
   };
 